@@ -3,126 +3,240 @@
 Check and fix token configuration for Claude Desktop
 """
 
+import io
 import json
 import os
+import re
+import stat
+import sys
+from enum import Enum
+from functools import lru_cache, partial
 from pathlib import Path
-import platform
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if sys.platform == "win32":
+    _CLAUDE_CONFIG_PATH = Path(os.getenv('APPDATA') or Path.home() / "AppData" / "Roaming") / "Claude" / "claude_desktop_config.json"
+elif sys.platform == "darwin":  # macOS
+    _CLAUDE_CONFIG_PATH = Path.home() / "Library" / "Application Support" / "Claude" / "claude_desktop_config.json"
+else:  # Linux
+    _CLAUDE_CONFIG_PATH = Path.home() / ".config" / "claude" / "claude_desktop_config.json"
 
 def get_claude_config_path():
     """Get Claude Desktop config path"""
-    if platform.system() == "Windows":
-        appdata = os.getenv('APPDATA')
-        if appdata:
-            return Path(appdata) / "Claude" / "claude_desktop_config.json"
-        else:
-            return Path.home() / "AppData" / "Roaming" / "Claude" / "claude_desktop_config.json"
-    elif platform.system() == "Darwin":  # macOS
-        return Path.home() / "Library" / "Application Support" / "Claude" / "claude_desktop_config.json"
-    else:  # Linux
-        return Path.home() / ".config" / "claude" / "claude_desktop_config.json"
+    return _CLAUDE_CONFIG_PATH
 
-def get_api_keys_from_env():
-    """Get API keys from .env file"""
-    def get_key(key_name):
-        # Environment
-        value = os.getenv(key_name)
-        if value:
-            return value
-        
-        # .env file
+def _load_json(path):
+    """Read and parse a JSON file (uses orjson when available)"""
+    # Both parsers accept raw bytes, so skip the text-mode decode layer
+    data = path.read_bytes()
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def _dump_json(path, obj, data=None):
+    """Serialize obj to a JSON file with 2-space indent, replacing it atomically
+
+    If data is given it is written as-is and must already be the encoded form of obj.
+    """
+    if data is None and orjson:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+    elif data is None:
+        data = (json.dumps(obj, indent=2) + "\n").encode("utf-8")
+    # Write to a sibling temp file and swap it in so readers never see a partial file.
+    # The config holds API keys: the temp file starts owner-only and then takes
+    # the mode of the file it replaces
+    tmp = path.with_suffix('.json.tmp')
+    tmp.unlink(missing_ok=True)
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
         try:
-            if os.path.exists('.env'):
-                with open('.env', 'r') as f:
-                    for line in f:
-                        if line.strip() and not line.startswith('#'):
-                            if '=' in line:
-                                env_key, env_value = line.strip().split('=', 1)
-                                if env_key.strip() == key_name:
-                                    # Remove quotes if present
-                                    env_value = env_value.strip().strip('"').strip("'")
-                                    return env_value
-        except Exception as e:
-            print(f"Error reading .env: {e}")
-        
+            os.chmod(tmp, stat.S_IMODE(path.stat().st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    # Keep the parsed config cache in sync with what is now on disk
+    st = path.stat()
+    _cfg_cache[str(path)] = {'mtime': st.st_mtime_ns, 'size': st.st_size, 'cfg': obj}
+
+# Parsed config files keyed by path, invalidated when the file's mtime or size changes
+_cfg_cache = {}
+
+def _load_cfg(path):
+    """Load a JSON config file, reusing the parsed result if the file is unchanged"""
+    st = path.stat()
+    cached = _cfg_cache.get(str(path))
+    if cached and cached['mtime'] == st.st_mtime_ns and cached['size'] == st.st_size:
+        return cached['cfg']
+    cfg = _load_json(path)
+    _cfg_cache[str(path)] = {'mtime': st.st_mtime_ns, 'size': st.st_size, 'cfg': cfg}
+    return cfg
+
+# KEY=value, KEY="value" or KEY='value', with an optional trailing " # comment"
+_ENV_RE = re.compile(
+    r"""^[ \t]*([A-Za-z_]\w*)[ \t]*=[ \t]*"""
+    r"""(?:"([^"\n]*)"|'([^'\n]*)'|([^\n]*?))[ \t]*(?:[ \t]#[^\n]*)?$""",
+    re.M,
+)
+
+@lru_cache(maxsize=4)
+def _parse_dotenv(path_str, mtime_ns):
+    """Parse a .env file into a dict in one pass (cached per path and mtime)"""
+    matches = _ENV_RE.findall(Path(path_str).read_text())
+    return dict((m[0], m[1] or m[2] or m[3]) for m in matches)
+
+def _read_dotenv(path='.env'):
+    """Return the parsed .env file, or None if it doesn't exist"""
+    try:
+        return _parse_dotenv(path, os.stat(path).st_mtime_ns)
+    except FileNotFoundError:
         return None
+
+def get_api_keys_from_env():
+    """Get API keys from environment or .env file"""
+    try:
+        env_vars = _read_dotenv() or {}
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Error reading .env: {e}")
+        env_vars = {}
     
-    return get_key('OPENAI_API_KEY'), get_key('IBM_QUANTUM_TOKEN')
+    return (os.getenv('OPENAI_API_KEY') or env_vars.get('OPENAI_API_KEY'),
+            os.getenv('IBM_QUANTUM_TOKEN') or env_vars.get('IBM_QUANTUM_TOKEN'))
+
+# Template values that mean the user never filled in a real key
+_OPENAI_PLACEHOLDERS = frozenset({"your-openai-api-key-here", "your-key-here", "sk-your-new-openai-key-here", "changeme"})
+_IBM_PLACEHOLDERS = frozenset({"your-ibm-quantum-token-here", "your-token-here", "your-new-ibm-token-here", "changeme"})
+
+# Pre-indented config for the common case where quantum-computation is the only server
+_CONFIG_TEMPLATE = """{{
+  "mcpServers": {{
+    "quantum-computation": {{
+      "command": {py},
+      "args": [
+        {sv}
+      ],
+      "env": {{
+        "OPENAI_API_KEY": {ok},
+        "IBM_QUANTUM_TOKEN": {ibm}
+      }}
+    }}
+  }}
+}}
+"""
+
+class KeyStatus(Enum):
+    """Result of sanity-checking a configured API key"""
+    VALID = "valid"
+    PLACEHOLDER = "placeholder"
+    SUSPECT = "suspect"
+    MISSING = "missing"
+
+@lru_cache(maxsize=8)
+def _mask(key):
+    """Mask a secret for display, keeping only its first 8 and last 4 characters"""
+    return f"{key[:8]}...{key[-4:]}" if key and len(key) > 12 else "<short>"
+
+def _classify_key(key, placeholders, prefix=None, min_len=20):
+    """Classify a key as valid, placeholder, suspect or missing"""
+    if not key:
+        return KeyStatus.MISSING
+    if (prefix is None or key.startswith(prefix)) and len(key) > min_len:
+        return KeyStatus.VALID
+    if key in placeholders:
+        return KeyStatus.PLACEHOLDER
+    return KeyStatus.SUSPECT
+
+_KEY_STATUS_MSGS = {
+    KeyStatus.VALID: "✅ {name}: {mask} (looks valid)",
+    KeyStatus.PLACEHOLDER: "❌ {name}: PLACEHOLDER - needs real {noun}!",
+    KeyStatus.SUSPECT: "⚠️  {name}: {mask} (check format)",
+    KeyStatus.MISSING: "❌ {name}: MISSING",
+}
+
+def _key_status_line(name, noun, key, placeholders, prefix=None, min_len=20):
+    """Build a one-line status report for a configured key"""
+    status = _classify_key(key, placeholders, prefix, min_len)
+    return _KEY_STATUS_MSGS[status].format(name=name, noun=noun, mask=_mask(key))
+
+def _emit(buf):
+    """Write everything buffered in buf to stdout in one call and reset it"""
+    data = buf.getvalue()
+    if data:
+        sys.stdout.write(data)
+        buf.seek(0)
+        buf.truncate()
+
+def _ask(prompt):
+    """Prompt on stdout and return the lowercased answer (no readline setup)"""
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    return sys.stdin.readline().strip().lower()
 
 def check_claude_config():
     """Check current Claude Desktop configuration"""
-    print("🔍 Checking Claude Desktop Configuration")
-    print("=" * 50)
-    
-    config_path = get_claude_config_path()
-    print(f"Config file: {config_path}")
-    
-    if not config_path.exists():
-        print("❌ Claude config file doesn't exist!")
-        return None
-    
+    out = io.StringIO()
+    p = partial(print, file=out)
     try:
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-        
-        if "mcpServers" not in config:
-            print("❌ No mcpServers section found")
-            return config
+        p("🔍 Checking Claude Desktop Configuration")
+        p("=" * 50)
         
-        if "quantum-computation" not in config["mcpServers"]:
-            print("❌ quantum-computation server not found")
-            return config
+        config_path = get_claude_config_path()
+        p(f"Config file: {config_path}")
         
-        server_config = config["mcpServers"]["quantum-computation"]
-        print("✅ Found quantum-computation server")
+        if not config_path.exists():
+            p("❌ Claude config file doesn't exist!")
+            return None
         
-        # Check environment variables
-        if "env" in server_config:
-            env_vars = server_config["env"]
+        try:
+            config = _load_cfg(config_path)
             
-            openai_key = env_vars.get("OPENAI_API_KEY", "")
-            ibm_token = env_vars.get("IBM_QUANTUM_TOKEN", "")
+            if "mcpServers" not in config:
+                p("❌ No mcpServers section found")
+                return config
             
-            print(f"\n🔑 Configured API Keys:")
+            if "quantum-computation" not in config["mcpServers"]:
+                p("❌ quantum-computation server not found")
+                return config
             
-            # Check OpenAI key
-            if openai_key:
-                if openai_key.startswith("sk-") and len(openai_key) > 20:
-                    print(f"✅ OpenAI API Key: {openai_key[:8]}...{openai_key[-4:]} (looks valid)")
-                elif openai_key in ["your-openai-api-key-here", "your-key-here"]:
-                    print(f"❌ OpenAI API Key: PLACEHOLDER - needs real key!")
-                else:
-                    print(f"⚠️  OpenAI API Key: {openai_key[:8]}... (check format)")
-            else:
-                print(f"❌ OpenAI API Key: MISSING")
+            server_config = config["mcpServers"]["quantum-computation"]
+            p("✅ Found quantum-computation server")
             
-            # Check IBM token
-            if ibm_token:
-                if len(ibm_token) > 50:
-                    print(f"✅ IBM Quantum Token: {ibm_token[:8]}...{ibm_token[-4:]} (looks valid)")
-                elif ibm_token in ["your-ibm-quantum-token-here", "your-token-here"]:
-                    print(f"❌ IBM Quantum Token: PLACEHOLDER - needs real token!")
-                else:
-                    print(f"⚠️  IBM Quantum Token: {ibm_token[:8]}... (check format)")
-            else:
-                print(f"❌ IBM Quantum Token: MISSING")
+            # Check environment variables
+            if "env" in server_config:
+                env_vars = server_config["env"]
                 
-        else:
-            print("❌ No environment variables configured")
-        
-        return config
-        
-    except Exception as e:
-        print(f"❌ Error reading config: {e}")
-        return None
+                openai_key = env_vars.get("OPENAI_API_KEY", "")
+                ibm_token = env_vars.get("IBM_QUANTUM_TOKEN", "")
+                
+                p(f"\n🔑 Configured API Keys:")
+                
+                p(_key_status_line("OpenAI API Key", "key", openai_key,
+                                   _OPENAI_PLACEHOLDERS, prefix="sk-", min_len=20))
+                p(_key_status_line("IBM Quantum Token", "token", ibm_token,
+                                   _IBM_PLACEHOLDERS, min_len=50))
+                    
+            else:
+                p("❌ No environment variables configured")
+            
+            return config
+            
+        except Exception as e:
+            p(f"❌ Error reading config: {e}")
+            return None
+    finally:
+        _emit(out)
 
-def fix_claude_config():
+def fix_claude_config(openai_key, ibm_token, verbose=False):
     """Fix Claude config with real API keys"""
     print("\n🔧 Fixing Claude Configuration")
     print("=" * 50)
     
-    # Get real API keys
-    openai_key, ibm_token = get_api_keys_from_env()
-    
     if not openai_key:
         print("❌ OpenAI API key not found in .env file")
         return False
@@ -131,32 +245,30 @@ def fix_claude_config():
         print("❌ IBM Quantum token not found in .env file")
         return False
     
-    print(f"✅ Found API keys in .env file:")
-    print(f"   OpenAI: {openai_key[:8]}...{openai_key[-4:]}")
-    print(f"   IBM: {ibm_token[:8]}...{ibm_token[-4:]}")
+    if verbose:
+        print(f"✅ Found API keys in .env file:")
+        print(f"   OpenAI: {_mask(openai_key)}")
+        print(f"   IBM: {_mask(ibm_token)}")
     
     # Get Claude config
     config_path = get_claude_config_path()
     
-    # Read existing config
-    config = {}
-    if config_path.exists():
-        try:
-            with open(config_path, 'r') as f:
-                config = json.load(f)
-        except:
-            pass
-    
-    # Update config
-    if "mcpServers" not in config:
-        config["mcpServers"] = {}
+    # Read existing config; refuse to overwrite one we can't parse
+    config_exists = True
+    try:
+        config = _load_cfg(config_path)
+    except FileNotFoundError:
+        config = {}
+        config_exists = False
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        print(f"❌ Claude config is corrupt, not overwriting it: {e}")
+        return False
     
     # Get current paths
     python_path = "D:/Coding_sakshi/mcp/QuantumCompute_mcp_server/.venv/Scripts/python.exe"
     server_path = "D:/Coding_sakshi/mcp/QuantumCompute_mcp_server/server.py"
     
-    # Update quantum-computation server
-    config["mcpServers"]["quantum-computation"] = {
+    new_server = {
         "command": python_path,
         "args": [server_path],
         "env": {
@@ -165,66 +277,101 @@ def fix_claude_config():
         }
     }
     
+    # Nothing to write if the stored entry already matches
+    if config.get("mcpServers", {}).get("quantum-computation") == new_server:
+        print(f"✅ Claude config already in sync with .env")
+        return True
+    
+    # Update config
+    if "mcpServers" not in config:
+        config["mcpServers"] = {}
+    
+    # Update quantum-computation server
+    config["mcpServers"]["quantum-computation"] = new_server
+    
     # Write config
     try:
-        config_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(config_path, 'w') as f:
-            json.dump(config, f, indent=2)
+        # An existing config file means its directory is already there
+        parent = config_path.parent
+        if not config_exists and not parent.exists():
+            parent.mkdir(parents=True, exist_ok=True)
+        data = None
+        if config.keys() == {"mcpServers"} and config["mcpServers"].keys() == {"quantum-computation"}:
+            py, sv, ok, ibm = (json.dumps(v, ensure_ascii=False)
+                               for v in (python_path, server_path, openai_key, ibm_token))
+            data = _CONFIG_TEMPLATE.format(py=py, sv=sv, ok=ok, ibm=ibm).encode("utf-8")
+        _dump_json(config_path, config, data)
         
         print(f"✅ Updated Claude config with real API keys")
         return True
         
     except Exception as e:
+        # The cached config was updated in place; drop it so the next read hits disk
+        _cfg_cache.pop(str(config_path), None)
         print(f"❌ Error writing config: {e}")
         return False
 
 def main():
     """Main function"""
-    print("🔑 Claude Desktop Token Configuration Checker")
-    print("=" * 60)
-    
-    # Check if we're in the right directory
-    if not os.path.exists('.env'):
-        print("❌ .env file not found!")
-        print("   Make sure you're in the QuantumCompute_mcp_server directory")
-        return False
-    
-    # Check current config
-    current_config = check_claude_config()
-    
-    if current_config is None:
-        print("\n❌ Could not read Claude config")
-        return False
-    
-    # Check .env file
-    print(f"\n📄 Checking .env file...")
-    openai_key, ibm_token = get_api_keys_from_env()
-    
-    if openai_key and ibm_token:
-        print(f"✅ Found valid API keys in .env:")
-        print(f"   OpenAI: {openai_key[:8]}...{openai_key[-4:]}")
-        print(f"   IBM: {ibm_token[:8]}...{ibm_token[-4:]}")
+    out = io.StringIO()
+    p = partial(print, file=out)
+    try:
+        p("🔑 Claude Desktop Token Configuration Checker")
+        p("=" * 60)
         
-        # Offer to fix config
-        response = input(f"\n🤔 Update Claude config with these real tokens? (y/n): ").strip().lower()
-        if response in ['y', 'yes']:
-            if fix_claude_config():
-                print(f"\n🎉 Configuration fixed!")
-                print(f"\n🔄 Next steps:")
-                print(f"1. Restart Claude Desktop completely")
-                print(f"2. Ask Claude: 'Create a Bell state'")
-                print(f"3. It should now use your real API tokens!")
-                return True
+        # Check if we're in the right directory
+        try:
+            dotenv = _read_dotenv()
+        except (OSError, UnicodeDecodeError) as e:
+            p(f"❌ Could not read .env: {e}")
+            return False
+        if dotenv is None:
+            p("❌ .env file not found!")
+            p("   Make sure you're in the QuantumCompute_mcp_server directory")
+            return False
+        
+        # Read .env once and reuse the keys for both the report and the fix
+        openai_key, ibm_token = get_api_keys_from_env()
+        
+        # Check current config
+        _emit(out)
+        current_config = check_claude_config()
+        
+        if current_config is None:
+            p("\n❌ Could not read Claude config")
+            return False
+        
+        # Check .env file
+        p(f"\n📄 Checking .env file...")
+        
+        if openai_key and ibm_token:
+            p(f"✅ Found valid API keys in .env:")
+            p(f"   OpenAI: {_mask(openai_key)}")
+            p(f"   IBM: {_mask(ibm_token)}")
+            
+            # Offer to fix config
+            _emit(out)
+            response = _ask(f"\n🤔 Update Claude config with these real tokens? (y/n): ")
+            if response in ['y', 'yes']:
+                if fix_claude_config(openai_key, ibm_token):
+                    p(f"\n🎉 Configuration fixed!")
+                    p(f"\n🔄 Next steps:")
+                    p(f"1. Restart Claude Desktop completely")
+                    p(f"2. Ask Claude: 'Create a Bell state'")
+                    p(f"3. It should now use your real API tokens!")
+                    return True
+            else:
+                p(f"\n💡 Manual fix:")
+                p(f"   Replace placeholder tokens in Claude config with:")
+                p(f"   OPENAI_API_KEY: {openai_key}")
+                p(f"   IBM_QUANTUM_TOKEN: {ibm_token}")
         else:
-            print(f"\n💡 Manual fix:")
-            print(f"   Replace placeholder tokens in Claude config with:")
-            print(f"   OPENAI_API_KEY: {openai_key}")
-            print(f"   IBM_QUANTUM_TOKEN: {ibm_token}")
-    else:
-        print(f"❌ API keys not found in .env file")
-        print(f"   Add them to .env file first")
-    
-    return False
+            p(f"❌ API keys not found in .env file")
+            p(f"   Add them to .env file first")
+        
+        return False
+    finally:
+        _emit(out)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
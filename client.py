@@ -5,8 +5,10 @@ Demonstrates how to interact with the Quantum Computation MCP Server
 """
 
 import asyncio
+import functools
 import json
 import os
+import re
 import subprocess
 import sys
 from typing import Dict, Any
@@ -21,6 +23,16 @@ except ImportError:
 except Exception as e:
     print(f"⚠️  Could not load .env file: {e}")
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 try:
     from mcp import ClientSession, StdioServerParameters
     from mcp.client.stdio import stdio_client
@@ -29,14 +41,85 @@ except ImportError:
     print("⚠️  MCP library not available, using subprocess mode only")
     MCP_AVAILABLE = False
 
+@functools.lru_cache(maxsize=1)
+def _read_env_file() -> Dict[str, str]:
+    """Parse ./.env once per process into a dict"""
+    try:
+        with open('.env', 'r') as f:
+            return {k.strip(): v.strip()
+                    for k, v in (line.strip().split('=', 1) for line in f
+                                 if line.strip() and not line.startswith('#') and '=' in line)}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"⚠️  Error reading .env file: {e}")
+        return {}
+
+# Upper bound on quantum computations the demo runs at the same time
+MAX_CONCURRENT_COMPUTATIONS = 3
+
+class _LogWriter:
+    """Background stdout writer so request coroutines don't block on print()
+    
+    Until start() is called (or after stop()) output is written synchronously.
+    """
+    
+    def __init__(self):
+        self._queue = None
+        self._task = None
+    
+    def start(self):
+        """Start the writer task on the running event loop"""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._drain())
+    
+    def __call__(self, *args):
+        """print()-style output, queued for the writer task when it is running"""
+        msg = " ".join(map(str, args)) + "\n"
+        if self._task is None:
+            sys.stdout.write(msg)
+        else:
+            self._queue.put_nowait(msg)
+    
+    async def _drain(self):
+        while True:
+            msg = await self._queue.get()
+            try:
+                sys.stdout.write(msg)
+                sys.stdout.flush()
+            except Exception:
+                # A closed or unencodable stdout must not stall flush()/stop()
+                pass
+            finally:
+                self._queue.task_done()
+    
+    async def flush(self):
+        """Wait until everything queued so far has been written"""
+        if self._task is not None:
+            await self._queue.join()
+    
+    async def stop(self):
+        """Flush queued output and stop the writer task"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
 class QuantumMCPClient:
     """Client for interacting with Quantum MCP Server"""
     
     def __init__(self):
         self.session = None
+        self._out = _LogWriter()
         self.stdio_context = None
         self.openai_key = os.getenv('OPENAI_API_KEY')
         self.ibm_token = os.getenv('IBM_QUANTUM_TOKEN')
+        # Environment for the server process, snapshotted once per client
+        self._child_env = dict(os.environ)
     
     async def connect(self, server_path: str = "./server.py"):
         """Connect to the MCP server"""
@@ -45,7 +128,7 @@ class QuantumMCPClient:
             server_params = StdioServerParameters(
                 command="python",
                 args=[server_path],
-                env=os.environ.copy()
+                env=self._child_env
             )
             
             # Start the server process and create session
@@ -54,6 +137,7 @@ class QuantumMCPClient:
             
             # Initialize the session
             await self.session.initialize()
+            self._out.start()
             
             print("✅ Connected to Quantum MCP Server")
             return True
@@ -65,6 +149,7 @@ class QuantumMCPClient:
     async def disconnect(self):
         """Disconnect from the MCP server"""
         try:
+            await self._out.stop()
             if self.session:
                 await self.session.close()
             print("🔌 Disconnected from server")
@@ -86,12 +171,12 @@ class QuantumMCPClient:
     async def run_quantum_computation(self, query: str, shots: int = 1024):
         """Run a quantum computation"""
         if not self.openai_key or not self.ibm_token:
-            print("❌ Please set OPENAI_API_KEY and IBM_QUANTUM_TOKEN environment variables")
+            self._out("❌ Please set OPENAI_API_KEY and IBM_QUANTUM_TOKEN environment variables")
             return None
         
         try:
-            print(f"\n🚀 Running quantum computation: '{query}'")
-            print("⏳ Processing...")
+            self._out(f"\n🚀 Running quantum computation: '{query}'")
+            self._out("⏳ Processing...")
             
             result = await self.session.call_tool(
                 "quantum_compute",
@@ -104,18 +189,18 @@ class QuantumMCPClient:
             )
             
             if hasattr(result, 'isError') and result.isError:
-                print(f"❌ Error: {result.content[0].text}")
+                self._out(f"❌ Error: {result.content[0].text}")
                 return None
             
-            print("\n" + "="*50)
+            self._out("\n" + "="*50)
             if hasattr(result, 'content') and result.content:
-                print(result.content[0].text)
+                self._out(result.content[0].text)
             else:
-                print("No content returned from server")
-            print("="*50)
+                self._out("No content returned from server")
+            self._out("="*50)
             return result
         except Exception as e:
-            print(f"❌ Error running computation: {e}")
+            self._out(f"❌ Error running computation: {e}")
             return None
     
     async def list_backends(self):
@@ -167,13 +252,316 @@ class QuantumMCPClient:
 
 
 # Alternative simplified client using subprocess
+def _encode_frame(message: Dict[str, Any]) -> bytes:
+    """Serialize a JSON-RPC message to a newline-terminated frame"""
+    if orjson:
+        return orjson.dumps(message) + b"\n"
+    return json.dumps(message).encode("utf-8") + b"\n"
+
+
+def _decode_frame(line: bytes) -> Dict[str, Any]:
+    """Parse one JSON-RPC frame (raises json.JSONDecodeError on non-JSON lines)"""
+    return orjson.loads(line) if orjson else json.loads(line)
+
+
+# Longest single line accepted from the server
+_READ_LIMIT = 1024 * 1024
+
+# Don't leak our file descriptors into the server, and keep it out of our process
+# group on POSIX so it is only stopped through disconnect()/terminate()
+_POPEN_KWARGS = {"close_fds": True, "start_new_session": os.name == "posix"}
+
+# Routine server log output that isn't worth showing to the user
+_STDOUT_SKIP_PREFIXES = ('INFO:', 'WARNING:')
+_STDERR_SKIP_SUBSTRINGS = ('INFO:', 'Services initialized successfully')
+_STDERR_SKIP_RE = re.compile('|'.join(map(re.escape, _STDERR_SKIP_SUBSTRINGS)))
+
+# The handshake frames never change, so build them once
+_INIT_FRAME = _encode_frame({
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {
+        "protocolVersion": "2024-11-05",
+        "capabilities": {},
+        "clientInfo": {
+            "name": "quantum-client",
+            "version": "1.0.0"
+        }
+    }
+})
+_INITED_FRAME = _encode_frame({
+    "jsonrpc": "2.0",
+    "method": "notifications/initialized"
+})
+
+
+class _ServerConnection:
+    """One server process driven over stdio JSON-RPC"""
+    
+    def __init__(self, env: Dict[str, str]):
+        self._env = env
+        self._proc = None
+        self._req_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._reader_task = None
+        self._stderr_task = None
+        self.log_lines = []
+        self.stderr_lines = []
+    
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.returncode is None
+    
+    async def _send(self, frame: bytes):
+        """Write one encoded JSON-RPC frame to the server"""
+        self._proc.stdin.write(frame)
+        await self._proc.stdin.drain()
+    
+    def _register(self, req_id: int) -> asyncio.Future:
+        """Create the future that the reader loop resolves for req_id"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = future
+        return future
+    
+    async def request(self, method: str, params: Dict[str, Any]) -> asyncio.Future:
+        """Send a JSON-RPC request and return a future for its response"""
+        self._req_id += 1
+        future = self._register(self._req_id)
+        await self._send(_encode_frame({"jsonrpc": "2.0", "id": self._req_id, "method": method, "params": params}))
+        return future
+    
+    async def _reader_loop(self, reader: asyncio.StreamReader):
+        """Route server stdout: JSON-RPC responses resolve pending futures, the rest is logged"""
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            line = line.strip()
+            if not line:
+                continue
+            response = None
+            # Only lines that look like JSON-RPC frames are worth parsing
+            if line.startswith(b'{') and b'"jsonrpc"' in line:
+                try:
+                    response = _decode_frame(line)
+                except json.JSONDecodeError:
+                    pass
+            if response is None:
+                # Non-JSON output, probably logs
+                line = line.decode('utf-8', errors='replace')
+                if not line.startswith(_STDOUT_SKIP_PREFIXES):
+                    self.log_lines.append(line)
+                continue
+            
+            if not isinstance(response, dict):
+                continue
+            future = self._pending.pop(response.get('id'), None)
+            if future and not future.done():
+                future.set_result(response)
+        
+        # Server went away; fail anything still waiting on it
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Server process exited"))
+        self._pending.clear()
+    
+    async def _stderr_loop(self, reader: asyncio.StreamReader):
+        """Drain server stderr so the pipe never fills up"""
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            line = line.decode('utf-8', errors='replace')
+            # Filter out routine log messages
+            if line.strip() and not _STDERR_SKIP_RE.search(line):
+                self.stderr_lines.append(line.rstrip('\n'))
+    
+    async def open(self):
+        """Start the server process and perform the MCP handshake"""
+        # Start server process with environment variables
+        self._proc = await asyncio.create_subprocess_exec(
+            sys.executable, "server.py",
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=self._env,
+            limit=_READ_LIMIT,
+            **_POPEN_KWARGS
+        )
+        self._req_id = 1
+        self._reader_task = asyncio.create_task(self._reader_loop(self._proc.stdout))
+        self._stderr_task = asyncio.create_task(self._stderr_loop(self._proc.stderr))
+        
+        # Step 1: Send initialization request
+        init_future = self._register(1)
+        try:
+            await self._send(_INIT_FRAME)
+        except ConnectionError:
+            pass  # the server already exited; reported below
+        
+        # Step 2: Wait for the initialization response itself rather than a fixed delay
+        try:
+            init_response = await asyncio.wait_for(init_future, timeout=120)
+        except (asyncio.TimeoutError, ConnectionError):
+            await self.close()
+            raise ConnectionError("Server did not answer the initialize request")
+        server_info = init_response.get('result', {}).get('serverInfo', {})
+        print(f"🔗 Connected to {server_info.get('name', 'Unknown')} v{server_info.get('version', 'Unknown')}")
+        
+        # Step 3: Send initialized notification
+        await self._send(_INITED_FRAME)
+    
+    async def close(self):
+        """Stop the server process"""
+        if self._proc is None:
+            return
+        if self._proc.returncode is None:
+            self._proc.kill()
+        await self._proc.wait()
+        for task in (self._reader_task, self._stderr_task):
+            if task:
+                await asyncio.gather(task, return_exceptions=True)
+        self._proc = None
+        self._reader_task = self._stderr_task = None
+
+
+class ServerPool:
+    """Pool of pre-initialized server processes
+    
+    Servers are spawned and driven through the MCP handshake ahead of time so
+    the Qiskit/OpenAI import cost isn't paid on the first computation. A server
+    that dies is replaced in the background.
+    """
+    
+    def __init__(self, env: Dict[str, str], size: int = 1):
+        self.size = size
+        self._env = env
+        self._conns = set()
+        self._idle = None
+        self._refill_tasks = set()
+        self._close_tasks = set()
+    
+    def _queue(self) -> asyncio.Queue:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+        return self._idle
+    
+    async def _open(self) -> _ServerConnection:
+        conn = _ServerConnection(self._env)
+        self._conns.add(conn)
+        try:
+            await conn.open()
+        except Exception:
+            self._conns.discard(conn)
+            raise
+        return conn
+    
+    async def _open_idle(self, conn: _ServerConnection):
+        """Open a server already counted in _conns and park it in the idle queue
+        
+        If opening fails the error is parked instead, so a waiting acquire()
+        wakes up and raises it.
+        """
+        try:
+            await conn.open()
+        except Exception as e:
+            self._conns.discard(conn)
+            await conn.close()
+            self._queue().put_nowait(e)
+            return
+        self._queue().put_nowait(conn)
+    
+    def _drop(self, conn: _ServerConnection):
+        self._conns.discard(conn)
+        task = asyncio.create_task(conn.close())
+        self._close_tasks.add(task)
+        task.add_done_callback(self._close_tasks.discard)
+    
+    def _top_up(self):
+        """Start replacements in the background until the pool is back to size
+        
+        Each replacement joins _conns right away, so a concurrent acquire()
+        waits for it instead of opening an extra server.
+        """
+        for _ in range(self.size - len(self._conns)):
+            conn = _ServerConnection(self._env)
+            self._conns.add(conn)
+            task = asyncio.create_task(self._open_idle(conn))
+            self._refill_tasks.add(task)
+            task.add_done_callback(self._refill_tasks.discard)
+    
+    async def start(self):
+        """Warm the pool up to size (idempotent)"""
+        missing = self.size - len(self._conns)
+        if missing <= 0:
+            return
+        if missing == 1:
+            self._queue().put_nowait(await self._open())
+            return
+        results = await asyncio.gather(*(self._open() for _ in range(missing)), return_exceptions=True)
+        conns = [r for r in results if isinstance(r, _ServerConnection)]
+        if not conns:
+            raise results[0]
+        for conn in conns:
+            self._queue().put_nowait(conn)
+    
+    async def acquire(self) -> _ServerConnection:
+        """Take a ready server out of the pool, opening one if none is running"""
+        idle = self._queue()
+        while True:
+            if idle.empty() and len(self._conns) < self.size:
+                return await self._open()
+            conn = await idle.get()
+            if isinstance(conn, Exception):
+                raise conn
+            if conn.alive:
+                return conn
+            self._drop(conn)
+            self._top_up()
+    
+    def release(self, conn: _ServerConnection):
+        """Return a server to the pool; dead ones are replaced in the background"""
+        if conn.alive:
+            self._queue().put_nowait(conn)
+        else:
+            self._drop(conn)
+            self._top_up()
+    
+    async def close(self):
+        """Stop every server in the pool"""
+        # Refills are cancelled, but their servers stay in _conns and are
+        # closed below; closes of dropped servers are left to finish
+        for task in list(self._refill_tasks):
+            task.cancel()
+        await asyncio.gather(*self._refill_tasks, *self._close_tasks, return_exceptions=True)
+        await asyncio.gather(*(conn.close() for conn in self._conns), return_exceptions=True)
+        self._conns.clear()
+        self._idle = None
+
+
 class SimpleQuantumClient:
-    """Simplified client using subprocess communication"""
+    """Simplified client using subprocess communication
     
-    def __init__(self):
+    Computations run on a pool of warm server processes that are reused until
+    disconnect() is called. Call connect() before the first computation so the
+    servers start up ahead of it; size the pool to the number of computations
+    run at once.
+    """
+    
+    def __init__(self, pool_size: int = 1):
         # Use the same API key reading method
         self.openai_key = self._get_api_key('OPENAI_API_KEY')
         self.ibm_token = self._get_api_key('IBM_QUANTUM_TOKEN')
+        # Environment for the server process, snapshotted once per client
+        self._child_env = {
+            **os.environ,
+            'OPENAI_API_KEY': self.openai_key or '',
+            'IBM_QUANTUM_TOKEN': self.ibm_token or '',
+        }
+        
+        self._pool = ServerPool(self._child_env, size=pool_size)
+        self._out = _LogWriter()
     
     def _get_api_key(self, key_name):
         """Get API key from environment or .env file"""
@@ -182,176 +570,103 @@ class SimpleQuantumClient:
         if value:
             return value
         
-        # Try reading from .env file manually if dotenv failed
-        try:
-            if os.path.exists('.env'):
-                with open('.env', 'r') as f:
-                    for line in f:
-                        if line.strip() and not line.startswith('#'):
-                            if '=' in line:
-                                env_key, env_value = line.strip().split('=', 1)
-                                if env_key.strip() == key_name:
-                                    return env_value.strip()
-        except Exception as e:
-            print(f"⚠️  Error reading .env file: {e}")
-        
-        return None
+        # Fall back to reading the .env file manually if dotenv failed
+        return _read_env_file().get(key_name)
+    
+    async def connect(self):
+        """Warm up the server pool"""
+        await self._pool.start()
+        self._out.start()
+        return True
+    
+    async def disconnect(self):
+        """Stop all server processes"""
+        await self._out.stop()
+        await self._pool.close()
     
     async def run_computation(self, query: str, shots: int = 1024):
-        """Run a quantum computation using subprocess"""
+        """Run a quantum computation on a pooled server process"""
         if not self.openai_key or not self.ibm_token:
-            print("❌ API keys not found!")
-            print("   Run: python client.py keys")
+            self._out("❌ API keys not found!")
+            self._out("   Run: python client.py keys")
             return None
         
         try:
-            print(f"\n🚀 Running quantum computation: '{query}'")
-            print("⏳ Processing...")
-            
-            # Start server process with environment variables
-            env = os.environ.copy()
-            env['OPENAI_API_KEY'] = self.openai_key
-            env['IBM_QUANTUM_TOKEN'] = self.ibm_token
-            
-            process = subprocess.Popen(
-                [sys.executable, "server.py"],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                encoding='utf-8',
-                errors='replace',  # Handle encoding errors gracefully
-                env=env
-            )
+            self._out(f"\n🚀 Running quantum computation: '{query}'")
+            self._out("⏳ Processing...")
             
+            await self.connect()
+            conn = await self._pool.acquire()
             try:
-                # Step 1: Send initialization request
-                init_request = {
-                    "jsonrpc": "2.0",
-                    "id": 1,
-                    "method": "initialize",
-                    "params": {
-                        "protocolVersion": "2024-11-05",
-                        "capabilities": {},
-                        "clientInfo": {
-                            "name": "quantum-client",
-                            "version": "1.0.0"
-                        }
-                    }
-                }
-                
-                process.stdin.write(json.dumps(init_request) + "\n")
-                process.stdin.flush()
-                
-                # Step 2: Wait for initialization response
-                await asyncio.sleep(2)
-                
-                # Step 3: Send initialized notification
-                initialized_notification = {
-                    "jsonrpc": "2.0",
-                    "method": "notifications/initialized"
-                }
-                
-                process.stdin.write(json.dumps(initialized_notification) + "\n")
-                process.stdin.flush()
-                
-                # Step 4: Send tool call request
-                tool_request = {
-                    "jsonrpc": "2.0",
-                    "id": 2,
-                    "method": "tools/call",
-                    "params": {
-                        "name": "quantum_compute",
-                        "arguments": {
-                            "query": query,
-                            "openai_key": self.openai_key,
-                            "ibm_token": self.ibm_token,
-                            "shots": shots
-                        }
-                    }
-                }
-                
-                process.stdin.write(json.dumps(tool_request) + "\n")
-                process.stdin.flush()
-                process.stdin.close()
-                
-                # Step 5: Wait for response with timeout
-                stdout, stderr = process.communicate(timeout=120)
-                
-                print("\n" + "="*50)
-                if stdout:
-                    print("📤 Server Response:")
-                    # Parse JSON responses line by line
-                    lines = stdout.strip().split('\n')
-                    quantum_result_found = False
-                    
-                    for line in lines:
-                        if line.strip():
-                            try:
-                                response = json.loads(line)
-                                
-                                # Look for tool call response
-                                if 'result' in response and response.get('id') == 2:
-                                    result_data = response['result']
-                                    if isinstance(result_data, list) and len(result_data) > 0:
-                                        # Extract text content from response
-                                        content_item = result_data[0]
-                                        if isinstance(content_item, dict) and content_item.get('type') == 'text':
-                                            print(content_item['text'])
-                                            quantum_result_found = True
-                                        else:
-                                            print(json.dumps(result_data, indent=2))
-                                            quantum_result_found = True
-                                    else:
-                                        print(f"📋 Server response: {json.dumps(result_data, indent=2)}")
-                                
-                                # Handle errors
-                                elif 'error' in response:
-                                    print(f"❌ Server Error: {response['error']['message']}")
-                                    if 'data' in response['error']:
-                                        print(f"   Details: {response['error']['data']}")
-                                
-                                # Handle initialization response
-                                elif 'result' in response and response.get('id') == 1:
-                                    server_info = response['result'].get('serverInfo', {})
-                                    print(f"🔗 Connected to {server_info.get('name', 'Unknown')} v{server_info.get('version', 'Unknown')}")
-                                
-                            except json.JSONDecodeError:
-                                # Non-JSON output, probably logs
-                                if line.strip() and not line.startswith('INFO:') and not line.startswith('WARNING:'):
-                                    print(f"📝 {line}")
-                    
-                    if not quantum_result_found:
-                        print("⚠️  No quantum computation result found in server response")
-                        print("🔍 Full server output:")
-                        print(stdout)
-                else:
-                    print("❌ No output received from server")
-                
-                if stderr and stderr.strip():
-                    # Filter out routine log messages
-                    error_lines = []
-                    for line in stderr.split('\n'):
-                        if line.strip() and not any(x in line for x in ['INFO:', 'Services initialized successfully']):
-                            error_lines.append(line)
-                    
-                    if error_lines:
-                        print("\n⚠️  Server Messages:")
-                        for line in error_lines:
-                            print(f"   {line}")
-                
-                print("="*50)
-                
-                return stdout
-                
-            except subprocess.TimeoutExpired:
-                process.kill()
-                print("❌ Server timed out after 120 seconds")
-                return None
-            
+                return await self._call(conn, query, shots)
+            finally:
+                self._pool.release(conn)
         except Exception as e:
-            print(f"❌ Error running computation: {e}")
+            self._out(f"❌ Error running computation: {e}")
             return None
+        finally:
+            # Callers print right after this returns, so our lines go first
+            await self._out.flush()
+    
+    async def _call(self, conn: _ServerConnection, query: str, shots: int):
+        """Send one quantum_compute call on conn and print its result"""
+        # Send tool call request
+        future = await conn.request("tools/call", {
+            "name": "quantum_compute",
+            "arguments": {
+                "query": query,
+                "openai_key": self.openai_key,
+                "ibm_token": self.ibm_token,
+                "shots": shots
+            }
+        })
+        
+        # Wait for response with timeout
+        try:
+            response = await asyncio.wait_for(future, timeout=120)
+        except asyncio.TimeoutError:
+            self._out("❌ Server timed out after 120 seconds")
+            await conn.close()
+            return None
+        
+        self._out("\n" + "="*50)
+        self._out("📤 Server Response:")
+        for line in conn.log_lines:
+            self._out(f"📝 {line}")
+        conn.log_lines.clear()
+        
+        result_text = None
+        if 'result' in response:
+            result_data = response['result']
+            if isinstance(result_data, list) and len(result_data) > 0:
+                # Extract text content from response
+                content_item = result_data[0]
+                if isinstance(content_item, dict) and content_item.get('type') == 'text':
+                    result_text = content_item['text']
+                else:
+                    result_text = json.dumps(result_data, indent=2)
+                self._out(result_text)
+            else:
+                self._out(f"📋 Server response: {json.dumps(result_data, indent=2)}")
+        
+        # Handle errors
+        elif 'error' in response:
+            self._out(f"❌ Server Error: {response['error']['message']}")
+            if 'data' in response['error']:
+                self._out(f"   Details: {response['error']['data']}")
+        
+        if result_text is None:
+            self._out("⚠️  No quantum computation result found in server response")
+        
+        if conn.stderr_lines:
+            self._out("\n⚠️  Server Messages:")
+            for line in conn.stderr_lines:
+                self._out(f"   {line}")
+            conn.stderr_lines.clear()
+        
+        self._out("="*50)
+        
+        return result_text or response
 
 
 async def demo_quantum_computations():
@@ -371,8 +686,8 @@ async def demo_quantum_computations():
                 
                 # Get information about operations
                 operations = ["bell_state", "grover", "qft", "teleportation"]
-                for op in operations:
-                    await client.get_circuit_info(op)
+                await asyncio.gather(*(client.get_circuit_info(op) for op in operations),
+                                     return_exceptions=True)
                 
                 # Run various quantum computations
                 queries = [
@@ -383,9 +698,14 @@ async def demo_quantum_computations():
                     "Demonstrate quantum superposition with Hadamard gates"
                 ]
                 
-                for query in queries:
-                    await client.run_quantum_computation(query, shots=1024)
-                    await asyncio.sleep(2)  # Brief pause between computations
+                # Run them concurrently, capped so IBM Quantum isn't flooded with jobs
+                sem = asyncio.Semaphore(MAX_CONCURRENT_COMPUTATIONS)
+                
+                async def run_one(query):
+                    async with sem:
+                        return await client.run_quantum_computation(query, shots=1024)
+                
+                await asyncio.gather(*(run_one(q) for q in queries), return_exceptions=True)
                 
                 await client.disconnect()
                 return
@@ -396,7 +716,11 @@ async def demo_quantum_computations():
     
     # Fallback to simple client
     print("🔄 Using subprocess client mode")
-    simple_client = SimpleQuantumClient()
+    queries = [
+        "Create a Bell state to demonstrate quantum entanglement",
+        "Generate quantum random numbers using 3 qubits"
+    ]
+    simple_client = SimpleQuantumClient(pool_size=min(len(queries), MAX_CONCURRENT_COMPUTATIONS))
     
     # Check API keys
     if not simple_client.openai_key or not simple_client.ibm_token:
@@ -404,9 +728,15 @@ async def demo_quantum_computations():
         print("   Run: python client.py keys")
         return
     
-    # Run one test with simple client
-    await simple_client.run_computation("Create a Bell state to demonstrate quantum entanglement")
-    await simple_client.run_computation("Generate quantum random numbers using 3 qubits")
+    # Run a couple of tests with simple client, one warm server process each
+    try:
+        # Start the servers before the first query instead of inside it
+        await simple_client.connect()
+        await asyncio.gather(*(simple_client.run_computation(q) for q in queries))
+    except Exception as e:
+        print(f"❌ Failed to start the server pool: {e}")
+    finally:
+        await simple_client.disconnect()
 
 
 async def interactive_mode():
@@ -420,13 +750,24 @@ async def interactive_mode():
         print("\n🎮 Simple Interactive Quantum Computation Mode")
         print("Type 'quit' to exit")
         
-        while True:
-            query = input("\n🔬 Enter quantum computation query: ").strip()
+        try:
+            # Start the server before the first prompt; if that fails the
+            # first query retries it
+            try:
+                await simple_client.connect()
+            except Exception as e:
+                print(f"⚠️  Could not start the server yet: {e}")
             
-            if query.lower() in ['quit', 'exit', 'q']:
-                break
-            else:
-                await simple_client.run_computation(query)
+            while True:
+                await simple_client._out.flush()
+                query = input("\n🔬 Enter quantum computation query: ").strip()
+                
+                if query.lower() in ['quit', 'exit', 'q']:
+                    break
+                else:
+                    await simple_client.run_computation(query)
+        finally:
+            await simple_client.disconnect()
         return
     
     print("\n🎮 Interactive Quantum Computation Mode")
@@ -434,6 +775,7 @@ async def interactive_mode():
     
     try:
         while True:
+            await client._out.flush()
             query = input("\n🔬 Enter quantum computation query: ").strip()
             
             if query.lower() in ['quit', 'exit', 'q']:
@@ -474,12 +816,13 @@ async def test_server():
     
     try:
         # Test simple subprocess connection
-        process = subprocess.Popen(
-            [sys.executable, "server.py"],
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "server.py",
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True
+            limit=_READ_LIMIT,
+            **_POPEN_KWARGS
         )
         
         # Send a simple request
@@ -497,25 +840,29 @@ async def test_server():
             }
         }
         
-        process.stdin.write(json.dumps(init_request) + "\n")
-        process.stdin.flush()
-        
-        # Wait briefly
-        await asyncio.sleep(2)
+        process.stdin.write(_encode_frame(init_request))
+        try:
+            await process.stdin.drain()
+        except ConnectionError:
+            pass
         
-        # Check if process is responsive
-        if process.poll() is None:
+        # Check if the process is still up after a short wait
+        try:
+            await asyncio.wait_for(process.wait(), timeout=2)
+        except asyncio.TimeoutError:
             print("✅ Server is running and responsive!")
             process.terminate()
-            await asyncio.sleep(1)
-            if process.poll() is None:
+            try:
+                await asyncio.wait_for(process.wait(), timeout=1)
+            except asyncio.TimeoutError:
                 process.kill()
+                await process.wait()
             return True
         else:
-            stdout, stderr = process.communicate()
+            stdout, stderr = await process.communicate()
             print(f"❌ Server failed to start:")
-            print(f"stdout: {stdout}")
-            print(f"stderr: {stderr}")
+            print(f"stdout: {stdout.decode('utf-8', errors='replace')}")
+            print(f"stderr: {stderr.decode('utf-8', errors='replace')}")
             return False
             
     except Exception as e:
@@ -542,12 +889,12 @@ def generate_claude_config():
         }
     }
     
-    return json.dumps(config, indent=2)
+    return config
 
 
 def save_claude_config():
     """Save Claude Desktop configuration"""
-    config_content = generate_claude_config()
+    new_config = generate_claude_config()
     
     # Determine config path based on OS
     import platform
@@ -573,15 +920,14 @@ def save_claude_config():
             pass
     
     # Merge configurations
-    new_config = json.loads(config_content)
     if "mcpServers" not in existing_config:
         existing_config["mcpServers"] = {}
     
     existing_config["mcpServers"].update(new_config["mcpServers"])
     
     # Write configuration
-    with open(config_path, 'w') as f:
-        f.write(json.dumps(existing_config, indent=2))
+    with open(config_path, 'w', buffering=65536) as f:
+        json.dump(existing_config, f, indent=2)
     
     print(f"📝 Claude configuration saved to: {config_path}")
     print("⚠️  Remember to update the API keys in the configuration file!")
@@ -601,17 +947,9 @@ def setup_api_keys():
             return value, "environment"
         
         # .env file
-        try:
-            if os.path.exists('.env'):
-                with open('.env', 'r') as f:
-                    for line in f:
-                        if line.strip() and not line.startswith('#'):
-                            if '=' in line:
-                                env_key, env_value = line.strip().split('=', 1)
-                                if env_key.strip() == key_name:
-                                    return env_value.strip(), ".env file"
-        except Exception:
-            pass
+        value = _read_env_file().get(key_name)
+        if value:
+            return value, ".env file"
         
         return None, "not found"
     
@@ -690,6 +1028,19 @@ DEFAULT_SHOTS=1024
     except Exception as e:
         print(f"❌ Error creating .env file: {e}")
         return False
+
+
+def _run(coro):
+    """asyncio.run() on uvloop when it is installed"""
+    if uvloop is None:
+        return asyncio.run(coro)
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            return runner.run(coro)
+    uvloop.install()
+    return asyncio.run(coro)
+
+
 def main():
     """Main function with CLI interface"""
     import sys
@@ -699,16 +1050,16 @@ def main():
 
         if command == 'demo':
             print("🎯 Running quantum computation demo...")
-            asyncio.run(demo_quantum_computations())
+            _run(demo_quantum_computations())
         elif command == 'interactive':
             print("🎮 Starting interactive mode...")
-            asyncio.run(interactive_mode())
+            _run(interactive_mode())
         elif command == 'config':
             print("⚙️  Generating Claude Desktop configuration...")
             save_claude_config()
         elif command == 'test':
             print("🧪 Testing server...")
-            asyncio.run(test_server())
+            _run(test_server())
         else:
             print(f"❌ Unknown command: {command}")
             print("Available commands: demo, interactive, config, test")
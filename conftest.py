@@ -0,0 +1,54 @@
+"""
+Shared pytest fixtures for the Quantum MCP Server tests
+"""
+
+import json
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def server():
+    """The server module, imported once for the whole session (per xdist worker)"""
+    # Imported here so only the tests that need the server (and Qiskit) depend on it
+    import server
+    return server
+
+
+# Mock trees are prebuilt at import: Mock creates child mocks on first
+# attribute access, so wiring these up per test costs more than it looks.
+# Tests only read from them, so one copy per process is shared
+
+# Canned OpenAI reply asking for a 2-qubit Bell state, serialized once
+_BELL_STATE_JSON = json.dumps({
+    "operation_type": "bell_state",
+    "num_qubits": 2,
+    "parameters": {},
+    "reasoning": "User wants to create entangled qubits"
+})
+
+# OpenAI client whose chat completion returns that reply
+_OPENAI_BELL_RESPONSE = Mock(choices=[Mock(message=Mock(content=_BELL_STATE_JSON))])
+
+# The server talks to AsyncOpenAI and awaits create()
+MOCK_OPENAI_CLIENT = Mock()
+MOCK_OPENAI_CLIENT.chat.completions.create = AsyncMock(return_value=_OPENAI_BELL_RESPONSE)
+
+# IBM runtime service whose least busy backend is a 5-qubit device
+_IBM_BACKEND = Mock()
+_IBM_BACKEND.name = "test_backend"
+_IBM_BACKEND.configuration.return_value.configure_mock(num_qubits=5, simulator=False)
+
+MOCK_IBM_SERVICE = Mock()
+MOCK_IBM_SERVICE.least_busy.return_value = _IBM_BACKEND
+
+
+@pytest.fixture(scope="session")
+def mock_openai_client():
+    return MOCK_OPENAI_CLIENT
+
+
+@pytest.fixture(scope="session")
+def mock_ibm_service():
+    return MOCK_IBM_SERVICE
@@ -2,205 +2,329 @@
 """
 Fix Both APIs - Test Script
 Tests and helps fix both OpenAI and IBM Quantum API issues
+
+Usage: python fix_api.py [--force] [--verbose]
+  --force    ignore recently cached results
+  --verbose  also check the status of the first few backends
 """
 
+import asyncio
+import functools
+import hashlib
+import io
+import json
 import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from dotenv import load_dotenv
 
 # Load environment
 load_dotenv()
 
-def test_openai():
-    """Test OpenAI API key"""
-    print("🤖 Testing OpenAI API...")
-    print("-" * 30)
+# Successful validations are remembered on disk for a few minutes, keyed by a
+# hash of the key/token; pass --force to always re-check
+_DIAG_CACHE_PATH = Path.home() / '.cache' / 'quantum_mcp_diag.json'
+_DIAG_CACHE_TTL = 300
+_diag_cache_lock = threading.Lock()
+
+def _read_diag_cache():
+    try:
+        return json.loads(_DIAG_CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        return {}
+
+def _cache_get(secret):
+    """Return the cached validation result for secret, or None if missing/expired"""
+    entry = _read_diag_cache().get(hashlib.sha256(secret.encode()).hexdigest())
+    if entry and time.time() - entry['timestamp'] < _DIAG_CACHE_TTL:
+        return entry
+    return None
+
+def _cache_set(secret, channel=None):
+    """Remember that secret validated successfully (over channel, for IBM)"""
+    now = time.time()
+    with _diag_cache_lock:
+        cache = {k: v for k, v in _read_diag_cache().items()
+                 if now - v.get('timestamp', 0) < _DIAG_CACHE_TTL}
+        cache[hashlib.sha256(secret.encode()).hexdigest()] = {
+            'is_valid': True, 'channel': channel, 'timestamp': now
+        }
+        try:
+            _DIAG_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = _DIAG_CACHE_PATH.with_suffix('.json.tmp')
+            tmp_path.write_text(json.dumps(cache))
+            os.replace(tmp_path, _DIAG_CACHE_PATH)
+        except OSError:
+            pass
+
+# openai.OpenAI clients by API key, so repeat checks reuse the connection pool
+_openai_clients = {}
+
+def _get_openai(api_key):
+    """Return the shared OpenAI client for api_key"""
+    client = _openai_clients.get(api_key)
+    if client is None:
+        import openai
+        client = _openai_clients[api_key] = openai.OpenAI(api_key=api_key)
+    return client
+
+def _account_saved(channel, token):
+    """Check whether an account for channel is already saved with this token"""
+    from qiskit_ibm_runtime import QiskitRuntimeService
+    try:
+        saved = QiskitRuntimeService.saved_accounts()
+    except Exception:
+        return False
+    return any(account.get('channel') == channel and account.get('token') == token
+               for account in saved.values())
+
+def _save_account(channel, token):
+    """Persist the account for channel unless it is already saved with this token"""
+    from qiskit_ibm_runtime import QiskitRuntimeService
+    if not _account_saved(channel, token):
+        QiskitRuntimeService.save_account(
+            channel=channel,
+            token=token,
+            overwrite=True
+        )
+
+@functools.lru_cache(maxsize=None)
+def _try_channel(channel, token):
+    """Connect to IBM Quantum over channel, returning (service, backends)
+    
+    Successful lookups are cached per (channel, token); failures raise and are retried.
+    """
+    from qiskit_ibm_runtime import QiskitRuntimeService
+    service = QiskitRuntimeService(channel=channel, token=token)
+    return service, list(service.backends())
+
+# IBM channels in order of preference, with the labels used in the report
+_IBM_CHANNELS = {
+    "ibm_quantum_platform": "Platform",
+    "ibm_cloud": "Cloud",
+    "ibm_quantum": "Legacy",
+}
+
+def test_openai(out=None, force=False):
+    """Test OpenAI API key (output goes to out, default stdout)"""
+    p = functools.partial(print, file=out)
+    p("🤖 Testing OpenAI API...")
+    p("-" * 30)
     
     api_key = os.getenv('OPENAI_API_KEY')
     if not api_key:
-        print("❌ OPENAI_API_KEY not found in .env file")
+        p("❌ OPENAI_API_KEY not found in .env file")
         return False
     
-    print(f"Key format: {api_key[:8]}...")
+    p(f"Key format: {api_key[:8]}...")
+    
+    if not force and _cache_get(api_key):
+        p("✅ OpenAI API key is VALID! (checked recently, use --force to re-check)")
+        return True
     
     try:
-        import openai
-        client = openai.OpenAI(api_key=api_key)
+        client = _get_openai(api_key)
         
-        # Test with minimal request
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": "Hi"}],
-            max_tokens=1
-        )
+        # Listing models needs a valid key but costs no tokens
+        models = client.models.list()
         
-        print("✅ OpenAI API key is VALID!")
-        print(f"   Model: {response.model}")
-        print(f"   Usage: {response.usage.total_tokens} tokens")
+        p("✅ OpenAI API key is VALID!")
+        p(f"   Models available: {len(models.data)}")
+        _cache_set(api_key)
         return True
         
     except Exception as e:
         error_str = str(e)
-        print(f"❌ OpenAI API key is INVALID: {error_str[:100]}...")
+        p(f"❌ OpenAI API key is INVALID: {error_str[:100]}...")
         
         if "401" in error_str or "Unauthorized" in error_str:
-            print("\n🔧 How to fix:")
-            print("1. Go to: https://platform.openai.com/api-keys")
-            print("2. Create a NEW API key (delete the old one)")
-            print("3. Make sure it's a STANDARD key, not project-scoped")
-            print("4. Update your .env file with the new key")
-            print("5. Check your OpenAI account has billing/credits")
+            p("\n🔧 How to fix:")
+            p("1. Go to: https://platform.openai.com/api-keys")
+            p("2. Create a NEW API key (delete the old one)")
+            p("3. Make sure it's a STANDARD key, not project-scoped")
+            p("4. Update your .env file with the new key")
+            p("5. Check your OpenAI account has billing/credits")
         
         return False
 
-def test_ibm_quantum():
-    """Test IBM Quantum token with different methods"""
-    print("\n⚛️  Testing IBM Quantum...")
-    print("-" * 30)
+def _backend_summary(backend):
+    status = "🟢 Up" if backend.status().operational else "🔴 Down"
+    return f"   • {backend.name}: {backend.num_qubits} qubits - {status}"
+
+def test_ibm_quantum(out=None, force=False, verbose=False):
+    """Test IBM Quantum token with different methods (output goes to out, default stdout)"""
+    p = functools.partial(print, file=out)
+    p("\n⚛️  Testing IBM Quantum...")
+    p("-" * 30)
     
     token = os.getenv('IBM_QUANTUM_TOKEN')
     if not token:
-        print("❌ IBM_QUANTUM_TOKEN not found in .env file")
+        p("❌ IBM_QUANTUM_TOKEN not found in .env file")
         return False
     
-    print(f"Token format: {token[:8]}...")
+    p(f"Token format: {token[:8]}...")
+    
+    cached = None if force else _cache_get(token)
+    if cached:
+        p(f"✅ IBM Quantum works with channel {cached['channel']}! (checked recently, use --force to re-check)")
+        return True, cached['channel']
     
     try:
-        from qiskit_ibm_runtime import QiskitRuntimeService
-        
-        # Method 1: Try new IBM Quantum Platform
-        print("\n🧪 Method 1: IBM Quantum Platform")
+        import qiskit_ibm_runtime
+    except ImportError:
+        p("❌ qiskit-ibm-runtime not installed")
+        p("Install with: pip install qiskit-ibm-runtime")
+        return False, None
+    
+    # Try all channels at once. The first channel to connect wins, unless a
+    # more preferred channel is still being tried, in which case we wait for it
+    p("\n🧪 Trying IBM Quantum Platform, IBM Cloud and legacy IBM Quantum (deprecated) in parallel")
+    channels = list(_IBM_CHANNELS)
+    results = queue.Queue()
+    
+    def probe(channel):
         try:
-            QiskitRuntimeService.save_account(
-                channel="ibm_quantum_platform",
-                token=token,
-                overwrite=True
-            )
-            service = QiskitRuntimeService(channel="ibm_quantum_platform")
-            backends = list(service.backends())
-            
-            print(f"✅ IBM Quantum Platform WORKS! Found {len(backends)} backends")
-            
-            # Show some backends
-            for backend in backends[:3]:
-                status = "🟢 Up" if backend.status().operational else "🔴 Down"
-                print(f"   • {backend.name}: {backend.num_qubits} qubits - {status}")
-            
-            return True, "ibm_quantum_platform"
-            
-        except Exception as e1:
-            print(f"❌ Platform failed: {e1}")
-            
-            # Method 2: Try IBM Cloud
-            print("\n🧪 Method 2: IBM Cloud")
-            try:
-                QiskitRuntimeService.save_account(
-                    channel="ibm_cloud",
-                    token=token,
-                    overwrite=True
-                )
-                service = QiskitRuntimeService(channel="ibm_cloud")
-                backends = list(service.backends())
-                
-                print(f"✅ IBM Cloud WORKS! Found {len(backends)} backends")
-                return True, "ibm_cloud"
-                
-            except Exception as e2:
-                print(f"❌ Cloud failed: {e2}")
-                
-                # Method 3: Try legacy (deprecated but might work)
-                print("\n🧪 Method 3: Legacy IBM Quantum (deprecated)")
-                try:
-                    QiskitRuntimeService.save_account(
-                        channel="ibm_quantum",
-                        token=token,
-                        overwrite=True
-                    )
-                    service = QiskitRuntimeService(channel="ibm_quantum")
-                    backends = list(service.backends())
-                    
-                    print(f"⚠️  Legacy channel works but is deprecated!")
-                    print(f"   Found {len(backends)} backends")
-                    print("   ⚠️  This will stop working July 1st, 2025")
-                    return True, "ibm_quantum"
-                    
-                except Exception as e3:
-                    print(f"❌ Legacy failed: {e3}")
-                    
-                    print("\n🔧 All IBM methods failed! Here's how to fix:")
-                    print("\n🚨 ACCOUNT MIGRATION REQUIRED")
-                    print("Your IBM account needs to be migrated to the new platform.")
-                    print("\nSteps:")
-                    print("1. Go to: https://quantum.ibm.com/")
-                    print("2. Sign in with your IBM ID")
-                    print("3. Complete any migration steps shown")
-                    print("4. Get a NEW API token from Account Settings")
-                    print("5. If that doesn't work, try IBM Cloud:")
-                    print("   → https://cloud.ibm.com/")
-                    print("   → Sign up for IBM Cloud account")
-                    print("   → Find Quantum services")
-                    print("   → Get IBM Cloud API token")
-                    
-                    return False, None
+            results.put((channel, _try_channel(channel, token), None))
+        except Exception as e:
+            results.put((channel, None, e))
     
-    except ImportError:
-        print("❌ qiskit-ibm-runtime not installed")
-        print("Install with: pip install qiskit-ibm-runtime")
+    # Daemon threads, so a channel that hangs is abandoned once there is an
+    # answer instead of holding the interpreter open at exit
+    for channel in channels:
+        threading.Thread(target=probe, args=(channel,), daemon=True).start()
+    
+    connected = {}
+    finished = set()
+    winner = None
+    for _ in channels:
+        channel, result, error = results.get()
+        finished.add(channel)
+        if error is not None:
+            p(f"❌ {_IBM_CHANNELS[channel]} failed: {error}")
+            continue
+        
+        connected[channel] = result
+        winner = min(connected, key=channels.index)
+        if all(c in finished for c in channels[:channels.index(winner)]):
+            break
+    
+    if winner is None:
+        p("\n🔧 All IBM methods failed! Here's how to fix:")
+        p("\n🚨 ACCOUNT MIGRATION REQUIRED")
+        p("Your IBM account needs to be migrated to the new platform.")
+        p("\nSteps:")
+        p("1. Go to: https://quantum.ibm.com/")
+        p("2. Sign in with your IBM ID")
+        p("3. Complete any migration steps shown")
+        p("4. Get a NEW API token from Account Settings")
+        p("5. If that doesn't work, try IBM Cloud:")
+        p("   → https://cloud.ibm.com/")
+        p("   → Sign up for IBM Cloud account")
+        p("   → Find Quantum services")
+        p("   → Get IBM Cloud API token")
         return False, None
+    
+    service, backends = connected[winner]
+    if winner == "ibm_quantum_platform":
+        p(f"✅ IBM Quantum Platform WORKS! Found {len(backends)} backends")
+        
+        # Show some backends; each status is a separate request, so only
+        # fetch them (in parallel) when asked to
+        if verbose:
+            with ThreadPoolExecutor(max_workers=3) as status_executor:
+                for line in status_executor.map(_backend_summary, backends[:3]):
+                    p(line)
+        else:
+            for backend in backends[:3]:
+                p(f"   • {backend.name}: {backend.num_qubits} qubits")
+    elif winner == "ibm_cloud":
+        p(f"✅ IBM Cloud WORKS! Found {len(backends)} backends")
+    else:
+        p(f"⚠️  Legacy channel works but is deprecated!")
+        p(f"   Found {len(backends)} backends")
+        p("   ⚠️  This will stop working July 1st, 2025")
+    
+    # Only the winning channel is saved as the account
+    try:
+        _save_account(winner, token)
+    except Exception as e:
+        p(f"⚠️  Could not save the IBM Quantum account: {e}")
+    _cache_set(token, winner)
+    return True, winner
 
 def create_working_env_template(openai_works, ibm_works, ibm_channel):
     """Create a template .env file with working configuration"""
     
     print("\n📝 Creating .env template...")
     
-    template = """# Quantum MCP Server - Working Configuration
-# Replace with your actual API keys
-
-"""
+    parts = [
+        "# Quantum MCP Server - Working Configuration\n",
+        "# Replace with your actual API keys\n",
+        "\n",
+    ]
     
     if openai_works:
-        template += "# ✅ OpenAI key format is correct\n"
-        template += f"OPENAI_API_KEY={os.getenv('OPENAI_API_KEY')}\n\n"
+        parts += [
+            "# ✅ OpenAI key format is correct\n",
+            f"OPENAI_API_KEY={os.getenv('OPENAI_API_KEY')}\n\n",
+        ]
     else:
-        template += "# ❌ OpenAI key needs to be updated\n"
-        template += "# Get new key from: https://platform.openai.com/api-keys\n"
-        template += "OPENAI_API_KEY=sk-your-new-openai-key-here\n\n"
+        parts += [
+            "# ❌ OpenAI key needs to be updated\n",
+            "# Get new key from: https://platform.openai.com/api-keys\n",
+            "OPENAI_API_KEY=sk-your-new-openai-key-here\n\n",
+        ]
     
     if ibm_works:
-        template += f"# ✅ IBM Quantum working with channel: {ibm_channel}\n"
-        template += f"IBM_QUANTUM_TOKEN={os.getenv('IBM_QUANTUM_TOKEN')}\n"
-        template += f"IBM_QUANTUM_CHANNEL={ibm_channel}\n\n"
+        parts += [
+            f"# ✅ IBM Quantum working with channel: {ibm_channel}\n",
+            f"IBM_QUANTUM_TOKEN={os.getenv('IBM_QUANTUM_TOKEN')}\n",
+            f"IBM_QUANTUM_CHANNEL={ibm_channel}\n\n",
+        ]
     else:
-        template += "# ❌ IBM Quantum token needs to be updated\n"
-        template += "# Get new token from: https://quantum.ibm.com/account\n"
-        template += "IBM_QUANTUM_TOKEN=your-new-ibm-token-here\n"
-        template += "IBM_QUANTUM_CHANNEL=ibm_quantum_platform\n\n"
-    
-    template += """# Optional settings
-LOG_LEVEL=INFO
-DEFAULT_SHOTS=1024
-"""
+        parts += [
+            "# ❌ IBM Quantum token needs to be updated\n",
+            "# Get new token from: https://quantum.ibm.com/account\n",
+            "IBM_QUANTUM_TOKEN=your-new-ibm-token-here\n",
+            "IBM_QUANTUM_CHANNEL=ibm_quantum_platform\n\n",
+        ]
+    
+    parts += [
+        "# Optional settings\n",
+        "LOG_LEVEL=INFO\n",
+        "DEFAULT_SHOTS=1024\n",
+    ]
     
     try:
         with open('.env.new', 'w') as f:
-            f.write(template)
+            f.writelines(parts)
         print("✅ Created .env.new template file")
         print("   Review it and rename to .env when ready")
-    except:
+    except OSError:
         print("⚠️  Could not create .env.new file")
         print("Here's the template:")
-        print(template)
+        print("".join(parts))
 
-def main():
+async def main():
     """Run all tests and provide fix guidance"""
     
     print("🔧 API Key Diagnostic Tool")
     print("=" * 40)
     
-    # Test OpenAI
-    openai_works = test_openai()
-    
-    # Test IBM Quantum  
-    ibm_result = test_ibm_quantum()
+    # Test OpenAI and IBM Quantum at the same time; each buffers its own
+    # output so the reports don't interleave
+    force = '--force' in sys.argv[1:]
+    verbose = '--verbose' in sys.argv[1:]
+    openai_out, ibm_out = io.StringIO(), io.StringIO()
+    openai_works, ibm_result = await asyncio.gather(
+        asyncio.to_thread(test_openai, openai_out, force),
+        asyncio.to_thread(test_ibm_quantum, ibm_out, force, verbose)
+    )
+    print(openai_out.getvalue() + ibm_out.getvalue(), end="")
     if isinstance(ibm_result, tuple):
         ibm_works, ibm_channel = ibm_result
     else:
@@ -236,4 +360,4 @@ def main():
         print("   Server will work with simulator + local processing as fallback.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -2,149 +2,235 @@
 """
 Offline quantum test - no API calls needed
 Tests the core quantum circuit functionality
+
+Usage: python offline_test.py [--verbose]   (--verbose prints a QASM preview of each circuit)
 """
 
+import functools
+import importlib
+import io
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 # Add current directory to path
 sys.path.insert(0, '.')
 
-def test_circuit_creation():
+VERBOSE = '--verbose' in sys.argv[1:]
+
+# The server module (and with it Qiskit/OpenAI) is imported on first use only
+_server_module = None
+
+def _server():
+    """Import server on first call and return the module"""
+    global _server_module
+    if _server_module is None:
+        _server_module = importlib.import_module('server')
+    return _server_module
+
+# Simulator backends, shared across tests. main() starts building the
+# AerSimulator in the background so it is usually ready when a test needs it
+_legacy_backend = None
+_aer_future = None
+
+def _create_aer():
+    from qiskit_aer import AerSimulator
+    return AerSimulator()
+
+def _preload_aer():
+    """Start building the shared AerSimulator in the background (idempotent)"""
+    global _aer_future
+    if _aer_future is None:
+        executor = ThreadPoolExecutor(max_workers=1)
+        _aer_future = executor.submit(_create_aer)
+        executor.shutdown(wait=False)
+    return _aer_future
+
+def _get_aer():
+    """Return the shared AerSimulator (raises ImportError without qiskit_aer)"""
+    return _preload_aer().result()
+
+def _get_legacy_backend():
+    """Return the shared pre-1.0 Qiskit qasm_simulator backend"""
+    global _legacy_backend
+    if _legacy_backend is None:
+        from qiskit import Aer
+        _legacy_backend = Aer.get_backend('qasm_simulator')
+    return _legacy_backend
+
+def _circuit_qasm(circuit):
+    """Serialize circuit to OpenQASM 2 (qasm2.dumps on Qiskit 1.0+, circuit.qasm() before)"""
+    try:
+        from qiskit import qasm2
+    except ImportError:
+        return circuit.qasm()
+    return qasm2.dumps(circuit)
+
+def check_circuit_creation(out=None):
     """Test quantum circuit creation without any external APIs"""
-    print("🧪 Offline Quantum Circuit Test")
-    print("=" * 50)
+    p = functools.partial(print, file=out)
+    p("🧪 Offline Quantum Circuit Test")
+    p("=" * 50)
+    
+    try:
+        server = _server()
+    except Exception as e:
+        p(f"❌ Test failed: {e}")
+        return False
     
     try:
-        # Import the server functions directly
-        from server import create_quantum_circuit, QuantumComputationRequest, QuantumOperationType
-        
         # Test different circuit types
         test_cases = [
-            ("Bell State", QuantumOperationType.BELL_STATE, 2),
-            ("Quantum Random", QuantumOperationType.QUANTUM_RANDOM, 3),
-            ("QFT", QuantumOperationType.QUANTUM_FOURIER_TRANSFORM, 3),
-            ("Grover Search", QuantumOperationType.GROVER_SEARCH, 3),
+            ("Bell State", server.QuantumOperationType.BELL_STATE, 2),
+            ("Quantum Random", server.QuantumOperationType.QUANTUM_RANDOM, 3),
+            ("QFT", server.QuantumOperationType.QUANTUM_FOURIER_TRANSFORM, 3),
+            ("Grover Search", server.QuantumOperationType.GROVER_SEARCH, 3),
         ]
         
-        print("🔬 Testing quantum circuit creation...")
+        p("🔬 Testing quantum circuit creation...")
         
-        for name, op_type, num_qubits in test_cases:
+        def build(case):
+            """Create one test circuit; returns (circuit, preview, error)"""
+            name, op_type, num_qubits = case
             try:
-                print(f"\n🔹 Testing {name}...")
-                
-                request = QuantumComputationRequest(
+                request = server.QuantumComputationRequest(
                     query=f"Test {name}",
                     operation_type=op_type,
                     parameters={},
                     num_qubits=num_qubits
                 )
-                
-                circuit = create_quantum_circuit(request)
-                
-                print(f"   ✅ Circuit created: {circuit.num_qubits} qubits, {circuit.num_clbits} classical bits")
-                print(f"   📊 Circuit depth: {circuit.depth()}")
-                
-                # Try to draw the circuit
-                try:
-                    circuit_str = str(circuit.draw(output='text'))
-                    print(f"   🎨 Circuit preview:")
-                    # Show first few lines
-                    lines = circuit_str.split('\n')[:4]
-                    for line in lines:
-                        print(f"      {line}")
-                    if len(lines) > 4:
-                        print("      ...")
-                except Exception as e:
-                    print(f"   ⚠️  Circuit visualization error: {e}")
-                
+                circuit = server.create_quantum_circuit(request)
             except Exception as e:
-                print(f"   ❌ Error creating {name}: {e}")
+                return None, None, e
+            
+            # The preview is only worth serializing when it will be shown
+            if not VERBOSE:
+                return circuit, None, None
+            try:
+                preview = _circuit_qasm(circuit)
+            except Exception as e:
+                preview = e
+            return circuit, preview, None
+        
+        # Build all cases up front; they are independent of each other
+        with ThreadPoolExecutor() as executor:
+            built = list(executor.map(build, test_cases))
+        
+        for (name, _, _), (circuit, circuit_str, error) in zip(test_cases, built):
+            p(f"\n🔹 Testing {name}...")
+            if error is not None:
+                p(f"   ❌ Error creating {name}: {error}")
+                continue
+            
+            p(f"   ✅ Circuit created: {circuit.num_qubits} qubits, {circuit.num_clbits} classical bits")
+            p(f"   📊 Circuit depth: {circuit.depth()}")
+            
+            if circuit_str is None:
+                continue
+            if isinstance(circuit_str, Exception):
+                p(f"   ⚠️  Circuit visualization error: {circuit_str}")
+                continue
+            p(f"   🎨 Circuit preview:")
+            # Show first few lines
+            lines = circuit_str.split('\n')
+            for line in lines[:4]:
+                p(f"      {line}")
+            if len(lines) > 4:
+                p("      ...")
         
-        print("\n✅ Circuit creation tests completed!")
+        p("\n✅ Circuit creation tests completed!")
         return True
         
     except Exception as e:
-        print(f"❌ Test failed: {e}")
+        p(f"❌ Test failed: {e}")
         return False
 
-def test_local_simulation():
+def check_local_simulation(out=None):
     """Test local quantum simulation"""
-    print("\n🧪 Local Simulation Test")
-    print("=" * 50)
+    p = functools.partial(print, file=out)
+    p("\n🧪 Local Simulation Test")
+    p("=" * 50)
+    
+    try:
+        server = _server()
+    except Exception as e:
+        p(f"❌ Simulation test failed: {e}")
+        return False
     
     try:
-        from server import create_quantum_circuit, QuantumComputationRequest, QuantumOperationType
-        
         # Create a simple Bell state
-        request = QuantumComputationRequest(
+        request = server.QuantumComputationRequest(
             query="Test Bell state",
-            operation_type=QuantumOperationType.BELL_STATE,
+            operation_type=server.QuantumOperationType.BELL_STATE,
             parameters={},
             num_qubits=2
         )
         
-        circuit = create_quantum_circuit(request)
-        print("🔬 Created Bell state circuit")
+        circuit = server.create_quantum_circuit(request)
+        p("🔬 Created Bell state circuit")
         
         # Try different simulation methods
         simulation_success = False
         
         # Method 1: Try qiskit_aer (Qiskit 2.0+)
         try:
-            from qiskit_aer import AerSimulator
-            simulator = AerSimulator()
+            simulator = _get_aer()
             job = simulator.run(circuit, shots=1024)
             result = job.result()
             counts = result.get_counts()
             
-            print("✅ AerSimulator works!")
-            print(f"📊 Results: {counts}")
+            p("✅ AerSimulator works!")
+            p(f"📊 Results: {counts}")
             simulation_success = True
             
         except ImportError:
-            print("⚠️  qiskit_aer not available")
+            p("⚠️  qiskit_aer not available")
         except Exception as e:
-            print(f"⚠️  AerSimulator error: {e}")
+            p(f"⚠️  AerSimulator error: {e}")
         
         # Method 2: Try old Qiskit Aer
         if not simulation_success:
             try:
-                from qiskit import Aer, execute
-                backend = Aer.get_backend('qasm_simulator')
+                from qiskit import execute
+                backend = _get_legacy_backend()
                 job = execute(circuit, backend, shots=1024)
                 result = job.result()
                 counts = result.get_counts()
                 
-                print("✅ Legacy Aer simulator works!")
-                print(f"📊 Results: {counts}")
+                p("✅ Legacy Aer simulator works!")
+                p(f"📊 Results: {counts}")
                 simulation_success = True
                 
             except ImportError:
-                print("⚠️  Legacy Aer not available")
+                p("⚠️  Legacy Aer not available")
             except Exception as e:
-                print(f"⚠️  Legacy Aer error: {e}")
+                p(f"⚠️  Legacy Aer error: {e}")
         
         if simulation_success:
-            print("\n✅ Local simulation working!")
+            p("\n✅ Local simulation working!")
         else:
-            print("\n⚠️  No local simulators available, but that's OK")
-            print("   The server will use dummy results as fallback")
+            p("\n⚠️  No local simulators available, but that's OK")
+            p("   The server will use dummy results as fallback")
         
         return True
         
     except Exception as e:
-        print(f"❌ Simulation test failed: {e}")
+        p(f"❌ Simulation test failed: {e}")
         return False
 
-def test_pattern_matching():
+def check_pattern_matching(out=None):
     """Test the local query processing (no OpenAI)"""
-    print("\n🧪 Pattern Matching Test")
-    print("=" * 50)
+    p = functools.partial(print, file=out)
+    p("\n🧪 Pattern Matching Test")
+    p("=" * 50)
+    
+    try:
+        server = _server()
+    except Exception as e:
+        p(f"❌ Pattern matching test failed: {e}")
+        return False
     
     try:
-        from server import process_query_locally
-        
         test_queries = [
             "Create a Bell state",
             "Generate random numbers with 3 qubits",
@@ -155,19 +241,19 @@ def test_pattern_matching():
         
         for query in test_queries:
             try:
-                result = process_query_locally(query)
-                print(f"🔹 '{query}'")
-                print(f"   → Operation: {result.operation_type.value}")
-                print(f"   → Qubits: {result.num_qubits}")
+                result = server.process_query_locally(query)
+                p(f"🔹 '{query}'")
+                p(f"   → Operation: {result.operation_type.value}")
+                p(f"   → Qubits: {result.num_qubits}")
                 
             except Exception as e:
-                print(f"❌ Error processing '{query}': {e}")
+                p(f"❌ Error processing '{query}': {e}")
         
-        print("\n✅ Pattern matching working!")
+        p("\n✅ Pattern matching working!")
         return True
         
     except Exception as e:
-        print(f"❌ Pattern matching test failed: {e}")
+        p(f"❌ Pattern matching test failed: {e}")
         return False
 
 def main():
@@ -175,21 +261,37 @@ def main():
     print("🚀 Offline Quantum Tests (No APIs Required)")
     print("=" * 60)
     
+    # Import server (and Qiskit) on this thread before any other thread
+    # starts: a first import of Qiskit racing across threads crashes the
+    # interpreter
+    try:
+        _server()
+    except Exception:
+        pass  # each check reports the failed import itself
+    
+    _preload_aer()
+    
     tests = [
-        ("Circuit Creation", test_circuit_creation),
-        ("Local Simulation", test_local_simulation), 
-        ("Pattern Matching", test_pattern_matching),
+        ("Circuit Creation", check_circuit_creation),
+        ("Local Simulation", check_local_simulation), 
+        ("Pattern Matching", check_pattern_matching),
     ]
     
     results = []
     
-    for test_name, test_func in tests:
-        try:
-            result = test_func()
+    # The tests are independent, so run them side by side; each writes to its
+    # own buffer, printed in order once it has finished
+    with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+        runs = [(test_name, io.StringIO()) for test_name, _ in tests]
+        futures = [executor.submit(test_func, out) for (_, test_func), (_, out) in zip(tests, runs)]
+        for (test_name, out), future in zip(runs, futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                out.write(f"\n❌ {test_name} failed with exception: {e}\n")
+                result = False
+            print(out.getvalue(), end="")
             results.append((test_name, result))
-        except Exception as e:
-            print(f"\n❌ {test_name} failed with exception: {e}")
-            results.append((test_name, False))
     
     # Summary
     print("\n" + "=" * 60)
@@ -4,24 +4,51 @@ Quick test script for quantum computations
 """
 
 import asyncio
+import collections
 import sys
 import os
+import time
 
 # Add current directory to path
 sys.path.insert(0, '.')
 
-async def test_simple_computation():
+MULTIPLE_TESTS = [
+    "Create a Bell state",
+    "Generate random numbers with 3 qubits", 
+    "Apply Hadamard gates to 2 qubits"
+]
+
+# Computations started per second by the multiple test; below len(MULTIPLE_TESTS)
+# so the last one waits for the next window instead of all hitting IBM at once
+MAX_CALLS_PER_SECOND = 2
+
+class RateLimiter:
+    """Async context manager allowing at most max_rate entries per time_period seconds"""
+    
+    def __init__(self, max_rate, time_period=1.0):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._starts = collections.deque()
+        self._lock = asyncio.Lock()
+    
+    async def __aenter__(self):
+        async with self._lock:
+            if len(self._starts) >= self.max_rate:
+                delay = self._starts[0] + self.time_period - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self._starts.popleft()
+            self._starts.append(time.monotonic())
+    
+    async def __aexit__(self, *exc_info):
+        return False
+
+async def check_simple_computation(client):
     """Test a simple quantum computation"""
     print("🧪 Quick Quantum Test")
     print("=" * 50)
     
     try:
-        # Import the client
-        from client import SimpleQuantumClient
-        
-        # Create client
-        client = SimpleQuantumClient()
-        
         # Check API keys
         if not client.openai_key:
             print("❌ OPENAI_API_KEY not found")
@@ -53,41 +80,40 @@ async def test_simple_computation():
         print(f"❌ Test failed: {e}")
         return False
 
-async def test_multiple_computations():
+async def check_multiple_computations(client):
     """Test multiple quantum computations"""
     print("\n🧪 Multiple Quantum Tests")
     print("=" * 50)
     
     try:
-        from client import SimpleQuantumClient
-        client = SimpleQuantumClient()
-        
         if not client.openai_key or not client.ibm_token:
             print("❌ API keys not found")
             return False
         
-        tests = [
-            "Create a Bell state",
-            "Generate random numbers with 3 qubits", 
-            "Apply Hadamard gates to 2 qubits"
-        ]
+        tests = MULTIPLE_TESTS
         
         success_count = 0
         
-        for i, test in enumerate(tests, 1):
+        # Run the tests concurrently, one pooled server each, paced by the
+        # limiter instead of a fixed delay
+        limiter = RateLimiter(max_rate=MAX_CALLS_PER_SECOND, time_period=1.0)
+        
+        async def run_one(i, test):
             print(f"\n🔬 Test {i}/{len(tests)}: {test}")
-            try:
-                result = await client.run_computation(test, shots=512)
-                if result:
-                    success_count += 1
-                    print(f"✅ Test {i} passed")
-                else:
-                    print(f"❌ Test {i} failed")
-            except Exception as e:
-                print(f"❌ Test {i} error: {e}")
-            
-            # Small delay between tests
-            await asyncio.sleep(1)
+            async with limiter:
+                return await client.run_computation(test, shots=512)
+        
+        results = await asyncio.gather(*(run_one(i, test) for i, test in enumerate(tests, 1)),
+                                       return_exceptions=True)
+        
+        for i, result in enumerate(results, 1):
+            if isinstance(result, Exception):
+                print(f"❌ Test {i} error: {result}")
+            elif result:
+                success_count += 1
+                print(f"✅ Test {i} passed")
+            else:
+                print(f"❌ Test {i} failed")
         
         print(f"\n📊 Results: {success_count}/{len(tests)} tests passed")
         return success_count == len(tests)
@@ -96,27 +122,50 @@ async def test_multiple_computations():
         print(f"❌ Multiple tests failed: {e}")
         return False
 
+async def run_tests(*tests, pool_size=1):
+    """Run tests in order on one shared client, stopping at the first failure"""
+    try:
+        # Import the client
+        from client import SimpleQuantumClient
+    except Exception as e:
+        print(f"❌ Test failed: {e}")
+        return False
+    
+    # One client (and so one pool of warm server processes) for the whole run
+    client = SimpleQuantumClient(pool_size=pool_size)
+    try:
+        if client.openai_key and client.ibm_token:
+            # Start the servers before the first test instead of inside it
+            try:
+                await client.connect()
+            except Exception as e:
+                print(f"❌ Failed to start the server pool: {e}")
+                return False
+        for test in tests:
+            if not await test(client):
+                return False
+        return True
+    finally:
+        await client.disconnect()
+
 def main():
     """Main test function"""
     if len(sys.argv) > 1:
         command = sys.argv[1].lower()
         
         if command == 'simple':
-            success = asyncio.run(test_simple_computation())
+            success = asyncio.run(run_tests(check_simple_computation))
             sys.exit(0 if success else 1)
         elif command == 'multiple':
-            success = asyncio.run(test_multiple_computations())
+            success = asyncio.run(run_tests(check_multiple_computations,
+                                            pool_size=len(MULTIPLE_TESTS)))
             sys.exit(0 if success else 1)
         elif command == 'all':
             print("🚀 Running All Tests")
             print("=" * 60)
             
-            simple_success = asyncio.run(test_simple_computation())
-            if simple_success:
-                multiple_success = asyncio.run(test_multiple_computations())
-                success = simple_success and multiple_success
-            else:
-                success = False
+            success = asyncio.run(run_tests(check_simple_computation, check_multiple_computations,
+                                            pool_size=len(MULTIPLE_TESTS)))
             
             print(f"\n🎯 Final Result: {'✅ ALL TESTS PASSED' if success else '❌ SOME TESTS FAILED'}")
             sys.exit(0 if success else 1)
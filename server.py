@@ -5,24 +5,31 @@ Uses environment variables and has proper fallbacks
 """
 
 import asyncio
+import functools
 import json
 import logging
 import sys
 import os
-from typing import Any, Dict, List, Optional, Sequence
+import threading
+from collections import Counter
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Sequence
 from dataclasses import dataclass
 from enum import Enum
 import re
 
-import openai
-from qiskit import QuantumCircuit, transpile
-from qiskit_ibm_runtime import QiskitRuntimeService, Sampler, Estimator
-from qiskit.quantum_info import SparsePauliOp
-from qiskit.visualization import circuit_drawer
-from qiskit_aer import AerSimulator
-from qiskit_aer import AerSimulator
+from qiskit import QuantumCircuit, qasm2
 import numpy as np
 
+# orjson parses the OpenAI reply faster; fall back to the stdlib parser
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+# openai, qiskit_aer, qiskit_ibm_runtime and the transpiler are imported where
+# they are first used, so the server answers the MCP handshake sooner
+
 # MCP imports
 from mcp.server.models import InitializationOptions
 import mcp.types as types
@@ -46,14 +53,18 @@ class QuantumOperationType(Enum):
     DEUTSCH_JOZSA = "deutsch_jozsa"
     BERNSTEIN_VAZIRANI = "bernstein_vazirani"
 
-@dataclass
+@dataclass(frozen=True)
 class QuantumComputationRequest:
-    """Request structure for quantum computation"""
+    """Request structure for quantum computation (immutable, so requests can be cached and shared)"""
     query: str
     operation_type: QuantumOperationType
-    parameters: Dict[str, Any]
+    parameters: Mapping[str, Any]
     num_qubits: int = 2
     shots: int = 1024
+    
+    def __post_init__(self):
+        # Cached requests are shared between callers, so parameters are read-only too
+        object.__setattr__(self, 'parameters', MappingProxyType(dict(self.parameters)))
 
 # Create the server instance
 server = Server("quantum-computation")
@@ -62,123 +73,117 @@ server = Server("quantum-computation")
 openai_client = None
 ibm_service = None
 simulator = None
-simulator = None
-
-def initialize_services():
-    """Initialize services using environment variables"""
-    global openai_client, ibm_service, simulator
-    
-    # Get API keys from environment
-    openai_key = os.getenv('OPENAI_API_KEY')
-    ibm_token = os.getenv('IBM_QUANTUM_TOKEN')
-    
-    logger.info(f"OpenAI key: {'Found' if openai_key else 'Missing'}")
-    logger.info(f"IBM token: {'Found' if ibm_token else 'Missing'}")
-    
-    # Always initialize simulator as fallback
+_services_ready = False
+_services_lock = asyncio.Lock()
+
+# IBM Quantum channels in order of preference
+IBM_CHANNELS = ["ibm_quantum_platform", "ibm_cloud", "ibm_quantum"]
+
+def _try_ibm_channel(channel: str, token: str):
+    """Connect to IBM Quantum over one channel (blocking); returns (service, backends)"""
+    from qiskit_ibm_runtime import QiskitRuntimeService
+    logger.debug("Trying IBM channel: %s", channel)
+    service = QiskitRuntimeService(channel=channel, token=token)
+    # Test by listing backends
+    return service, list(service.backends())
+
+async def connect_ibm_quantum(token: str):
+    """Try every IBM channel at once and return (channel, service, backends), or None
+    
+    The first channel to connect wins unless a more preferred one is still
+    being tried, in which case that one is waited for.
+    """
+    tasks = {asyncio.create_task(asyncio.to_thread(_try_ibm_channel, channel, token)): channel
+             for channel in IBM_CHANNELS}
+    pending = set(tasks)
+    connected = {}
+    winner = None
     try:
-        simulator = AerSimulator()
-        logger.info("Local simulator initialized")
-    except Exception as e:
-        logger.error(f"Failed to initialize simulator: {e}")
-        return False
-    
-    # Try to initialize OpenAI (optional)
-    if openai_key:
-        try:
-            openai_client = openai.OpenAI(api_key=openai_key)
-            # Test it
-            openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": "Hi"}],
-                max_tokens=1
-            )
-            logger.info("OpenAI initialized successfully")
-        except Exception as e:
-            logger.warning(f"OpenAI initialization failed: {e}")
-    
-    # Try to initialize IBM Quantum (optional)
-    if ibm_token:
-        # Try different channels
-        channels = ["ibm_quantum_platform", "ibm_cloud", "ibm_quantum"]
-        
-        for channel in channels:
-            try:
-                logger.info(f"Trying IBM channel: {channel}")
-                QiskitRuntimeService.save_account(
-                    channel=channel,
-                    token=ibm_token,
-                    overwrite=True
-                )
-                ibm_service = QiskitRuntimeService(channel=channel)
-                
-                # Test by listing backends
-                backends = list(ibm_service.backends())
-                logger.info(f"IBM Quantum initialized with {channel}: {len(backends)} backends")
-                break
-                
-            except Exception as e:
-                logger.warning(f"IBM channel {channel} failed: {e}")
-                continue
-    
-    # Return True if at least simulator works
-    return simulator is not None
-def initialize_services():
-    """Initialize services using environment variables"""
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                channel = tasks[task]
+                try:
+                    connected[channel] = task.result()
+                except Exception as e:
+                    logger.warning("IBM channel %s failed: %s", channel, e)
+            if connected:
+                winner = min(connected, key=IBM_CHANNELS.index)
+                if all(IBM_CHANNELS.index(tasks[task]) > IBM_CHANNELS.index(winner) for task in pending):
+                    break
+    finally:
+        for task in pending:
+            task.cancel()
+    
+    if winner is None:
+        return None
+    return (winner,) + connected[winner]
+
+async def initialize_services():
+    """Initialize services using environment variables (only the first successful call does any work)"""
+    global _services_ready
+    
+    if _services_ready:
+        return True
+    
+    async with _services_lock:
+        if not _services_ready:
+            _services_ready = await _initialize_services()
+    return _services_ready
+
+async def _initialize_services():
     global openai_client, ibm_service, simulator
     
     # Get API keys from environment
     openai_key = os.getenv('OPENAI_API_KEY')
     ibm_token = os.getenv('IBM_QUANTUM_TOKEN')
     
-    logger.info(f"OpenAI key: {'Found' if openai_key else 'Missing'}")
-    logger.info(f"IBM token: {'Found' if ibm_token else 'Missing'}")
+    logger.info("OpenAI key: %s", 'Found' if openai_key else 'Missing')
+    logger.info("IBM token: %s", 'Found' if ibm_token else 'Missing')
     
     # Always initialize simulator as fallback
     try:
-        simulator = AerSimulator()
+        from qiskit_aer import AerSimulator
+        # The circuits are a few qubits: plain statevector without gate fusion
+        # skips Aer's method selection and fusion planning, and one thread per
+        # run leaves the cores to concurrent requests
+        simulator = AerSimulator(method="statevector", fusion_enable=False, max_parallel_threads=1)
         logger.info("Local simulator initialized")
     except Exception as e:
-        logger.error(f"Failed to initialize simulator: {e}")
+        logger.error("Failed to initialize simulator: %s", e)
         return False
     
     # Try to initialize OpenAI (optional)
     if openai_key:
         try:
-            openai_client = openai.OpenAI(api_key=openai_key)
+            import openai
+            openai_client = openai.AsyncOpenAI(api_key=openai_key)
             # Test it
-            openai_client.chat.completions.create(
+            await openai_client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": "Hi"}],
                 max_tokens=1
             )
             logger.info("OpenAI initialized successfully")
         except Exception as e:
-            logger.warning(f"OpenAI initialization failed: {e}")
+            logger.warning("OpenAI initialization failed: %s", e)
     
-    # Try to initialize IBM Quantum (optional)
+    # Try to initialize IBM Quantum (optional), probing all channels in parallel
     if ibm_token:
-        # Try different channels
-        channels = ["ibm_quantum_platform", "ibm_cloud", "ibm_quantum"]
-        
-        for channel in channels:
+        connection = await connect_ibm_quantum(ibm_token)
+        if connection:
+            channel, ibm_service, backends = connection
+            logger.info("IBM Quantum initialized with %s: %d backends", channel, len(backends))
             try:
-                logger.info(f"Trying IBM channel: {channel}")
-                QiskitRuntimeService.save_account(
+                from qiskit_ibm_runtime import QiskitRuntimeService
+                await asyncio.to_thread(
+                    QiskitRuntimeService.save_account,
                     channel=channel,
                     token=ibm_token,
                     overwrite=True
                 )
-                ibm_service = QiskitRuntimeService(channel=channel)
-                
-                # Test by listing backends
-                backends = list(ibm_service.backends())
-                logger.info(f"IBM Quantum initialized with {channel}: {len(backends)} backends")
-                break
-                
             except Exception as e:
-                logger.warning(f"IBM channel {channel} failed: {e}")
-                continue
+                logger.warning("Could not save IBM account for %s: %s", channel, e)
     
     # Return True if at least simulator works
     return simulator is not None
@@ -204,7 +209,6 @@ async def handle_list_tools() -> list[types.Tool]:
                     }
                 },
                 "required": ["query"]
-                "required": ["query"]
             }
         ),
         types.Tool(
@@ -246,7 +250,7 @@ async def handle_call_tool(name: str, arguments: dict[str, Any] | None) -> list[
         else:
             raise ValueError(f"Unknown tool: {name}")
     except Exception as e:
-        logger.error(f"Error in {name}: {e}")
+        logger.error("Error in %s: %s", name, e)
         return [types.TextContent(type="text", text=f"Error: {str(e)}")]
 
 async def handle_quantum_compute(arguments: Dict[str, Any]) -> list[types.TextContent]:
@@ -254,50 +258,54 @@ async def handle_quantum_compute(arguments: Dict[str, Any]) -> list[types.TextCo
     query = arguments.get("query", "")
     shots = arguments.get("shots", 1024)
     
-    if not query:
-        return [types.TextContent(type="text", text="Missing required parameter: query")]
     if not query:
         return [types.TextContent(type="text", text="Missing required parameter: query")]
     
     # Initialize services (uses environment variables)
-    if not initialize_services():
-        return [types.TextContent(type="text", text="Failed to initialize quantum services - check that qiskit-aer is installed")]
-    # Initialize services (uses environment variables)
-    if not initialize_services():
+    if not await initialize_services():
         return [types.TextContent(type="text", text="Failed to initialize quantum services - check that qiskit-aer is installed")]
     
     # Process query (with fallback if OpenAI not available)
     computation_request = await process_query_with_openai(query)
     
-    # Create and execute circuit
-    circuit = create_quantum_circuit(computation_request)
+    # Create and execute circuit; the Qiskit work runs in worker threads so
+    # concurrent tool calls do not serialize on the event loop
+    circuit = await asyncio.to_thread(create_quantum_circuit, computation_request)
     
     # Execute (tries IBM, falls back to simulator)
-    results = await execute_quantum(circuit, shots)
+    results = await execute_quantum(circuit, shots, analytic_probabilities(computation_request))
     
     # Format results
-    response = format_results(computation_request, circuit, results)
+    response = await asyncio.to_thread(format_results, computation_request, circuit, results)
     
     return [types.TextContent(type="text", text=response)]
 
+async def fetch_backend_statuses(backends) -> list:
+    """Fetch status() for every backend concurrently (each one is a network call)"""
+    return await asyncio.gather(*(asyncio.to_thread(backend.status) for backend in backends))
+
 async def handle_list_backends(arguments: Dict[str, Any]) -> list[types.TextContent]:
     """List available IBM Quantum backends"""
-    if not initialize_services():
+    if not await initialize_services():
         return [types.TextContent(type="text", text="Failed to initialize services")]
     
     if ibm_service:
         try:
-            backends = list(ibm_service.backends())
+            backends = list(await asyncio.to_thread(ibm_service.backends))
+            # Statuses and configurations are one request each; fetch them all at once
+            statuses, configs = await asyncio.gather(
+                fetch_backend_statuses(backends),
+                asyncio.gather(*(asyncio.to_thread(backend.configuration) for backend in backends)),
+            )
             
             response = f"IBM Quantum Backends ({len(backends)} found):\n\n"
-            for backend in backends:
-                status = backend.status()
+            for backend, status, config in zip(backends, statuses, configs):
                 operational = "✅ Up" if status.operational else "❌ Down"
                 
                 response += f"• **{backend.name}**\n"
                 response += f"  - Qubits: {backend.num_qubits}\n"
                 response += f"  - Status: {operational}\n"
-                response += f"  - Simulator: {'Yes' if backend.configuration().simulator else 'No'}\n\n"
+                response += f"  - Simulator: {'Yes' if config.simulator else 'No'}\n\n"
             
             return [types.TextContent(type="text", text=response)]
         except Exception as e:
@@ -361,13 +369,13 @@ async def process_query_with_openai(query: str) -> QuantumComputationRequest:
             }}
             """
             
-            response = openai_client.chat.completions.create(
+            response = await openai_client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.1
             )
             
-            result = json.loads(response.choices[0].message.content)
+            result = json_loads(response.choices[0].message.content)
             
             return QuantumComputationRequest(
                 query=query,
@@ -376,86 +384,142 @@ async def process_query_with_openai(query: str) -> QuantumComputationRequest:
                 num_qubits=result["num_qubits"]
             )
         except Exception as e:
-            logger.warning(f"OpenAI processing failed: {e}, using local processing")
+            logger.warning("OpenAI processing failed: %s, using local processing", e)
     
     # Fallback to local processing
     return process_query_locally(query)
 
+# Keyword groups for local query matching, in priority order
+_LOCAL_KEYWORDS = {
+    'bell': ('bell', 'entangl', 'epr'),
+    'random': ('random', 'rng', 'number'),
+}
+_LOCAL_KEYWORD_RE = re.compile('|'.join(
+    f"(?P<{tag}>{'|'.join(map(re.escape, words))})" for tag, words in _LOCAL_KEYWORDS.items()
+))
+_NUMBER_RE = re.compile(r'\d+')
+
+def _local_bell_request(query: str) -> QuantumComputationRequest:
+    return QuantumComputationRequest(
+        query=query,
+        operation_type=QuantumOperationType.BELL_STATE,
+        parameters={},
+        num_qubits=2
+    )
+
+def _local_random_request(query: str) -> QuantumComputationRequest:
+    num_qubits = 3  # default
+    numbers = _NUMBER_RE.findall(query)
+    if numbers:
+        num_qubits = min(int(numbers[0]), 5)
+    return QuantumComputationRequest(
+        query=query,
+        operation_type=QuantumOperationType.QUANTUM_RANDOM,
+        parameters={},
+        num_qubits=num_qubits
+    )
+
+_LOCAL_HANDLERS = {
+    'bell': _local_bell_request,
+    'random': _local_random_request,
+}
+
+@functools.lru_cache(maxsize=1024)
 def process_query_locally(query: str) -> QuantumComputationRequest:
     """Process query using simple pattern matching (fallback when OpenAI fails)"""
-    query_lower = query.lower()
-    
-    # Pattern matching for different operations
-    if any(word in query_lower for word in ['bell', 'entangl', 'epr']):
-        return QuantumComputationRequest(
-            query=query,
-            operation_type=QuantumOperationType.BELL_STATE,
-            parameters={},
-            num_qubits=2
-        )
-    
-    elif any(word in query_lower for word in ['random', 'rng', 'number']):
-        num_qubits = 3  # default
-        numbers = re.findall(r'\d+', query)
-        if numbers:
-            num_qubits = min(int(numbers[0]), 5)
-        return QuantumComputationRequest(
-            query=query,
-            operation_type=QuantumOperationType.QUANTUM_RANDOM,
-            parameters={},
-            num_qubits=num_qubits
-        )
-    
-    else:
-        # Default
-        return QuantumComputationRequest(
-            query=query,
-            operation_type=QuantumOperationType.BELL_STATE,
-            parameters={},
-            num_qubits=2
-        )
+    # One scan over the query collects every keyword group that occurs
+    found = {m.lastgroup for m in _LOCAL_KEYWORD_RE.finditer(query.lower())}
+    for tag in _LOCAL_KEYWORDS:
+        if tag in found:
+            return _LOCAL_HANDLERS[tag](query)
+    
+    # Default
+    return _local_bell_request(query)
+
+# Input-state markers checked in order against the query; the first hit wins
+_STATE_TABLE = [
+    (('|00⟩ + |10⟩', '|00> + |10>'), "superposition_0_2"),  # |00⟩ + |10⟩
+    (('|0⟩ + |2⟩', '|0> + |2>'), "superposition_0_2"),      # Same as above in decimal notation
+    (('|01⟩ + |11⟩', '|01> + |11>'), "superposition_1_3"),  # |01⟩ + |11⟩
+    (('|0⟩ + |1⟩', '|0> + |1>'), "superposition_0_1"),      # |0⟩ + |1⟩
+]
 
 def extract_input_state_from_query(query: str) -> str:
     """Extract quantum state specification from the query"""
     
     # Look for patterns like |psi> = (1/sqrt(2))(|00> + |10>)
     # or |ψ⟩ = (1/√2)(|0⟩ + |2⟩)
+    for markers, state in _STATE_TABLE:
+        if any(marker in query for marker in markers):
+            return state
     
-    if '|00⟩ + |10⟩' in query or '|00> + |10>' in query:
-        return "superposition_0_2"  # |00⟩ + |10⟩
-    elif '|0⟩ + |2⟩' in query or '|0> + |2>' in query:
-        return "superposition_0_2"  # Same as above in decimal notation
-    elif '|01⟩ + |11⟩' in query or '|01> + |11>' in query:
-        return "superposition_1_3"  # |01⟩ + |11⟩
-    elif '|0⟩ + |1⟩' in query or '|0> + |1>' in query:
-        return "superposition_0_1"  # |0⟩ + |1⟩
-    elif 'equal superposition' in query.lower():
+    if 'equal superposition' in query.lower():
         return "equal_superposition"  # All computational basis states
-    else:
-        # Default to the user's specific case
-        return "superposition_0_2"  # |00⟩ + |10⟩
-
-def create_quantum_circuit(request: QuantumComputationRequest) -> QuantumCircuit:
-    """Create quantum circuit with proper input state preparation + operation"""
-    
-    if request.operation_type == QuantumOperationType.QUANTUM_FOURIER_TRANSFORM:
-        return create_qft_circuit_with_input_state(request)
-    
-    elif request.operation_type == QuantumOperationType.BELL_STATE:
-        circuit = QuantumCircuit(2, 2)
-        circuit.h(0)
-        circuit.cx(0, 1)
-        circuit.measure_all()
-        return circuit
     
-    elif request.operation_type == QuantumOperationType.QUANTUM_RANDOM:
-        circuit = QuantumCircuit(request.num_qubits, request.num_qubits)
-        for i in range(request.num_qubits):
-            circuit.h(i)
-    
-    else:
-        # Default to superposition_0_2
-        circuit.h(0)
+    # Default to the user's specific case
+    return "superposition_0_2"  # |00⟩ + |10⟩
+
+def _build_qft2_circuit() -> QuantumCircuit:
+    """The fixed 2-qubit QFT: H, controlled phase of pi/2, H, then swap to restore bit order"""
+    qft = QuantumCircuit(2, name="qft2")
+    qft.h(1)
+    qft.cp(np.pi / 2, 0, 1)
+    qft.h(0)
+    qft.swap(0, 1)
+    return qft
+
+# Built once at import; apply_2qubit_qft() composes it into each circuit
+_QFT2_CIRCUIT = _build_qft2_circuit()
+
+def apply_2qubit_qft(circuit: QuantumCircuit) -> None:
+    """Apply the 2-qubit QFT to qubits 0 and 1 of circuit, in place"""
+    circuit.compose(_QFT2_CIRCUIT, qubits=[0, 1], inplace=True)
+
+def qft_input_state(request: QuantumComputationRequest) -> str:
+    """The QFT input state named in the request, else the one described in the query"""
+    return request.parameters.get('input_state') or extract_input_state_from_query(request.query)
+
+# Unitary of _QFT2_CIRCUIT over basis-state indices (qubit 0 least significant)
+_QFT2_MATRIX = np.array([[1j ** (j * k) for j in range(4)] for k in range(4)]) / 2
+
+# Amplitudes of the documented QFT input states, same index order
+_INPUT_AMPLITUDES = {
+    "superposition_0_2": np.array([1, 0, 1, 0]) / np.sqrt(2),
+    "superposition_1_3": np.array([0, 1, 0, 1]) / np.sqrt(2),
+    "superposition_0_1": np.array([1, 1, 0, 0]) / np.sqrt(2),
+    "equal_superposition": np.full(4, 0.5),
+}
+
+def _output_distribution(amplitudes: np.ndarray) -> np.ndarray:
+    probs = np.abs(_QFT2_MATRIX @ amplitudes) ** 2
+    return probs / probs.sum()
+
+# Exact QFT output distribution per input state. The simulator fallback
+# samples counts from these instead of running Aer on the circuit
+_ANALYTIC_QFT_PROBS = {state: _output_distribution(amps) for state, amps in _INPUT_AMPLITUDES.items()}
+
+def analytic_probabilities(request: QuantumComputationRequest) -> Optional[np.ndarray]:
+    """Known output distribution for a canonical 2-qubit QFT request, else None"""
+    if request.operation_type != QuantumOperationType.QUANTUM_FOURIER_TRANSFORM:
+        return None
+    return _ANALYTIC_QFT_PROBS.get(qft_input_state(request))
+
+# Gates preparing each documented QFT input state from |00⟩ (qubit 0 least significant)
+_STATE_PREP = {
+    "superposition_0_2": (("h", 1),),
+    "superposition_1_3": (("x", 0), ("h", 1)),
+    "superposition_0_1": (("h", 0),),
+    "equal_superposition": (("h", 0), ("h", 1)),
+}
+
+def create_qft_circuit_with_input_state(request: QuantumComputationRequest) -> QuantumCircuit:
+    """Prepare the requested input state, apply the 2-qubit QFT and measure"""
+    circuit = QuantumCircuit(2)
+    
+    # Step 1: Prepare the input state (unknown states use the default)
+    prep = _STATE_PREP.get(qft_input_state(request), _STATE_PREP["superposition_0_2"])
+    for gate, qubit in prep:
+        getattr(circuit, gate)(qubit)
     
     # Add a barrier to separate state preparation from QFT
     circuit.barrier()
@@ -468,56 +532,262 @@ def create_quantum_circuit(request: QuantumComputationRequest) -> QuantumCircuit
     
     return circuit
 
-async def execute_quantum(circuit: QuantumCircuit, shots: int = 1024):
-    """Execute quantum circuit (tries IBM, falls back to simulator)"""
+def _build_bell(request: QuantumComputationRequest) -> QuantumCircuit:
+    circuit = QuantumCircuit(2)
+    circuit.h(0)
+    circuit.cx(0, 1)
+    circuit.measure_all()
+    return circuit
+
+def _build_random(request: QuantumComputationRequest) -> QuantumCircuit:
+    circuit = QuantumCircuit(request.num_qubits)
+    circuit.h(range(request.num_qubits))
+    circuit.measure_all()
+    return circuit
+
+def _apply_mcz(circuit: QuantumCircuit, qubits: List[int]) -> None:
+    """Phase-flip the state where all of qubits are 1"""
+    *controls, target = qubits
+    circuit.h(target)
+    circuit.mcx(controls, target)
+    circuit.h(target)
+
+def _build_grover(request: QuantumComputationRequest) -> QuantumCircuit:
+    """One Grover iteration over at least 2 qubits, marking the all-ones state"""
+    n = max(request.num_qubits, 2)
+    qubits = list(range(n))
+    circuit = QuantumCircuit(n)
+    circuit.h(qubits)
+    
+    # Oracle: flip the phase of |1...1⟩
+    _apply_mcz(circuit, qubits)
+    
+    # Diffusion: reflect about the uniform superposition
+    circuit.h(qubits)
+    circuit.x(qubits)
+    _apply_mcz(circuit, qubits)
+    circuit.x(qubits)
+    circuit.h(qubits)
+    
+    circuit.measure_all()
+    return circuit
+
+def _build_deutsch_jozsa(request: QuantumComputationRequest) -> QuantumCircuit:
+    """Deutsch-Jozsa with a balanced (parity) oracle; the last qubit is the ancilla"""
+    n = max(request.num_qubits, 2)
+    inputs = list(range(n - 1))
+    ancilla = n - 1
+    circuit = QuantumCircuit(n, n - 1)
+    circuit.x(ancilla)
+    circuit.h(range(n))
+    
+    # Balanced oracle f(x) = x_0 xor ... xor x_{n-2}
+    for qubit in inputs:
+        circuit.cx(qubit, ancilla)
+    
+    # A balanced f never measures all zeros on the inputs
+    circuit.h(inputs)
+    circuit.measure(inputs, inputs)
+    return circuit
+
+# Circuit builder per operation; each returns a complete, measured circuit
+_BUILDERS = {
+    QuantumOperationType.QUANTUM_FOURIER_TRANSFORM: create_qft_circuit_with_input_state,
+    QuantumOperationType.BELL_STATE: _build_bell,
+    QuantumOperationType.QUANTUM_RANDOM: _build_random,
+    QuantumOperationType.GROVER_SEARCH: _build_grover,
+    QuantumOperationType.DEUTSCH_JOZSA: _build_deutsch_jozsa,
+}
+
+def create_quantum_circuit(request: QuantumComputationRequest) -> QuantumCircuit:
+    """Create quantum circuit with proper input state preparation + operation"""
+    builder = _BUILDERS.get(request.operation_type)
+    if builder is None:
+        supported = ", ".join(op.value for op in _BUILDERS)
+        raise ValueError(f"Unsupported operation: {request.operation_type.value} (supported: {supported})")
+    return builder(request)
+
+# Level-0 pass managers per backend name: layout, routing and basis
+# translation only. The circuits here are a handful of gates, so the
+# optimization passes of higher levels cost time without improving them
+_pass_managers: Dict[str, Any] = {}
+
+# transpile_cached() runs on worker threads; this guards both caches
+_transpile_lock = threading.Lock()
+
+def _pass_manager(backend):
+    with _transpile_lock:
+        pm = _pass_managers.get(backend.name)
+        if pm is None:
+            from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+            pm = _pass_managers[backend.name] = generate_preset_pass_manager(optimization_level=0, backend=backend)
+        return pm
+
+# Transpiled circuits keyed by (OpenQASM text, backend name); the same few
+# small circuits are requested over and over
+_TRANSPILE_CACHE_SIZE = 128
+_transpile_cache: Dict[tuple, QuantumCircuit] = {}
+
+def transpile_cached(circuit: QuantumCircuit, backend) -> QuantumCircuit:
+    """Transpile circuit for backend, reusing the result for identical circuits"""
+    # Simulators take the circuit as-is; the hardware pipeline buys nothing there
+    if backend.configuration().simulator:
+        return circuit
+    key = (qasm2.dumps(circuit), backend.name)
+    with _transpile_lock:
+        transpiled = _transpile_cache.get(key)
+    if transpiled is None:
+        # Transpile outside the lock; a concurrent miss on the same key just
+        # does the work twice
+        transpiled = _pass_manager(backend).run(circuit)
+        with _transpile_lock:
+            if key not in _transpile_cache and len(_transpile_cache) >= _TRANSPILE_CACHE_SIZE:
+                # Evict the oldest entry
+                del _transpile_cache[next(iter(_transpile_cache))]
+            _transpile_cache[key] = transpiled
+    return transpiled
+
+class _SamplerBatcher:
+    """Coalesce concurrent IBM submissions into one Sampler job per backend and shot count
+    
+    Circuits submitted within `window` seconds of each other (up to `max_batch`)
+    go out as a single sampler.run([...]); each caller gets its own PUB result.
+    """
+    
+    def __init__(self, window: float = 0.05, max_batch: int = 16):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[tuple, list] = {}
+        self._tasks = set()
+        # One Sampler per backend name, reused across jobs
+        self._samplers: Dict[str, Any] = {}
+    
+    def _sampler(self, backend):
+        sampler = self._samplers.get(backend.name)
+        if sampler is None:
+            from qiskit_ibm_runtime import Sampler
+            sampler = self._samplers[backend.name] = Sampler(backend)
+        return sampler
+    
+    def _spawn(self, coro):
+        # Keep a reference so the flush task isn't garbage collected mid-flight
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def submit(self, backend, circuit: QuantumCircuit, shots: int):
+        """Queue circuit for backend and wait for its result"""
+        key = (backend.name, shots)
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((circuit, future))
+        if len(batch) >= self.max_batch:
+            del self._pending[key]
+            self._spawn(self._flush(key, backend, batch))
+        elif len(batch) == 1:
+            self._spawn(self._flush_later(key, backend, batch))
+        return await future
+    
+    async def _flush_later(self, key: tuple, backend, batch: list):
+        await asyncio.sleep(self.window)
+        # The batch may already have gone out for being full
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+            await self._flush(key, backend, batch)
+    
+    async def _flush(self, key: tuple, backend, batch: list):
+        circuits = [circuit for circuit, _ in batch]
+        logger.debug("Submitting %d circuit(s) to %s", len(circuits), backend.name)
+        try:
+            sampler = self._sampler(backend)
+            job = await asyncio.to_thread(sampler.run, circuits, shots=key[1])
+            result = await asyncio.to_thread(job.result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for i, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(result[i])
+
+_sampler_batcher = _SamplerBatcher()
+
+def _hardware_backends(service) -> list:
+    """List the real (non-simulator) backends of an IBM service"""
+    return [b for b in service.backends() if not b.configuration().simulator]
+
+def _run_on_simulator(circuit: QuantumCircuit, shots: int):
+    """Run a circuit on the local Aer simulator and wait for the result"""
+    return simulator.run(circuit, shots=shots).result()
+
+_rng = np.random.default_rng()
+
+def sample_counts(probabilities: np.ndarray, shots: int) -> Dict[str, int]:
+    """Draw shot counts from a known distribution over 2-bit outcomes"""
+    samples = _rng.multinomial(shots, probabilities)
+    return {f"{i:02b}": int(count) for i, count in enumerate(samples) if count}
+
+async def execute_quantum(circuit: QuantumCircuit, shots: int = 1024,
+                          probabilities: Optional[np.ndarray] = None):
+    """Execute quantum circuit (tries IBM, falls back to simulator)
+
+    When probabilities is given (the exact output distribution of circuit),
+    the simulator fallback samples from it rather than running Aer.
+    """
     global ibm_service, simulator
     
     # Try IBM Quantum first if available
     if ibm_service:
         try:
-            logger.info("Attempting IBM Quantum execution...")
+            logger.debug("Attempting IBM Quantum execution...")
             
-            # Get the least busy real backend (not simulator)
-            backends = [b for b in ibm_service.backends() 
-                       if b.status().operational and not b.configuration().simulator]
+            # Get the least busy real backend (not simulator), fetching each
+            # status once and all of them in parallel
+            hardware = await asyncio.to_thread(_hardware_backends, ibm_service)
+            statuses = await fetch_backend_statuses(hardware)
+            backends = [(b, status) for b, status in zip(hardware, statuses) if status.operational]
             
             if backends:
-                # Sort by queue length
-                backends.sort(key=lambda b: b.status().pending_jobs)
-                backend = backends[0]
+                # Pick the shortest queue
+                backend, _ = min(backends, key=lambda pair: pair[1].pending_jobs)
                 
-                logger.info(f"Using IBM backend: {backend.name}")
+                logger.debug("Using IBM backend: %s", backend.name)
                 
                 # Transpile and execute
-                transpiled_circuit = transpile(circuit, backend, optimization_level=1)
-                sampler = Sampler(backend)
-                job = sampler.run([transpiled_circuit], shots=shots)
-                result = job.result()
+                transpiled_circuit = await asyncio.to_thread(transpile_cached, circuit, backend)
+                pub_result = await _sampler_batcher.submit(backend, transpiled_circuit, shots)
                 
                 return {
                     "backend": backend.name,
                     "backend_type": "🌟 IBM Quantum Hardware",
                     "shots": shots,
-                    "counts": result[0].data.meas.get_counts(),
+                    "counts": pub_result.data.meas.get_counts(),
                     "circuit_depth": transpiled_circuit.depth(),
                     "circuit_width": transpiled_circuit.width()
                 }
             else:
-                logger.info("No operational IBM hardware backends available")
+                logger.debug("No operational IBM hardware backends available")
                 
         except Exception as e:
-            logger.warning(f"IBM Quantum execution failed: {e}")
+            logger.warning("IBM Quantum execution failed: %s", e)
     
-    # Fallback to local simulator
-    logger.info("Using local simulator...")
-    job = simulator.run(circuit, shots=shots)
-    result = job.result()
+    # Fallback to local simulator, or sampling when the distribution is known
+    if probabilities is not None:
+        logger.debug("Sampling from the exact output distribution...")
+        backend, backend_type = "analytic_sampler", "📐 Analytic Sampling (no simulation)"
+        counts = sample_counts(probabilities, shots)
+    else:
+        logger.debug("Using local simulator...")
+        backend, backend_type = "aer_simulator", "🖥️  Local Simulator"
+        result = await asyncio.to_thread(_run_on_simulator, circuit, shots)
+        counts = result.get_counts()
     
     return {
-        "backend": "aer_simulator",
-        "backend_type": "🖥️  Local Simulator",
+        "backend": backend,
+        "backend_type": backend_type,
         "shots": shots,
-        "counts": result.get_counts(),
+        "counts": counts,
         "circuit_depth": circuit.depth(),
         "circuit_width": circuit.width()
     }
@@ -533,9 +803,9 @@ def format_results(request: QuantumComputationRequest, circuit: QuantumCircuit,
 def format_qft_results(request: QuantumComputationRequest, circuit: QuantumCircuit, results: Dict) -> str:
     """Format QFT-specific results with frequency analysis"""
     
-    input_state = request.parameters.get('input_state', 'superposition_0_2')
+    input_state = qft_input_state(request)
     
-    response = f"""
+    parts = [f"""
 🚀 Quantum Fourier Transform Results
 =====================================
 
@@ -547,18 +817,18 @@ def format_qft_results(request: QuantumComputationRequest, circuit: QuantumCircu
 🎯 Shots: {results['shots']}
 
 📊 QFT Output Measurements:
-"""
+"""]
     
     # Add measurement counts
     counts = results['counts']
     total_shots = sum(counts.values())
     
-    for state, count in sorted(counts.items(), key=lambda x: x[1], reverse=True):
+    for state, count in Counter(counts).most_common():
         probability = count / total_shots
         percentage = probability * 100
-        response += f"  |{state}⟩: {count:4d} ({percentage:5.1f}%)\n"
+        parts.append(f"  |{state}⟩: {count:4d} ({percentage:5.1f}%)\n")
     
-    response += f"""
+    parts.append(f"""
 🔧 Circuit Properties:
   • Total Depth: {results['circuit_depth']}
   • Width: {results['circuit_width']}
@@ -571,25 +841,21 @@ def format_qft_results(request: QuantumComputationRequest, circuit: QuantumCircu
 {circuit.draw(output='text')}
 
 ✅ Quantum Fourier Transform completed successfully!
-"""
+""")
     
-    return response
+    return "".join(parts)
 
-def get_input_state_description(input_state: str) -> str:
-    """Get human-readable description of input state"""
-    descriptions = {
-        "superposition_0_2": "|ψ⟩ = (1/√2)(|00⟩ + |10⟩) - States 0 and 2",
-        "superposition_1_3": "|ψ⟩ = (1/√2)(|01⟩ + |11⟩) - States 1 and 3", 
-        "superposition_0_1": "|ψ⟩ = (1/√2)(|0⟩ + |1⟩) - Single qubit superposition",
-        "equal_superposition": "|ψ⟩ = (1/2)(|00⟩ + |01⟩ + |10⟩ + |11⟩) - All states"
-    }
-    return descriptions.get(input_state, "Custom superposition state")
+# Human-readable descriptions of the supported input states
+_STATE_DESCS = {
+    "superposition_0_2": "|ψ⟩ = (1/√2)(|00⟩ + |10⟩) - States 0 and 2",
+    "superposition_1_3": "|ψ⟩ = (1/√2)(|01⟩ + |11⟩) - States 1 and 3", 
+    "superposition_0_1": "|ψ⟩ = (1/√2)(|0⟩ + |1⟩) - Single qubit superposition",
+    "equal_superposition": "|ψ⟩ = (1/2)(|00⟩ + |01⟩ + |10⟩ + |11⟩) - All states"
+}
 
-def analyze_qft_frequencies(input_state: str, counts: Dict[str, int]) -> str:
-    """Analyze the frequency components revealed by QFT"""
-    
-    if input_state == "superposition_0_2":
-        return """
+# Expected-QFT-output explanations for the supported input states
+_FREQ_ANALYSES = {
+    "superposition_0_2": """
 🎯 **Expected QFT Result for |ψ⟩ = (1/√2)(|00⟩ + |10⟩)**:
 
 📊 **Theoretical Prediction**:
@@ -608,10 +874,8 @@ def analyze_qft_frequencies(input_state: str, counts: Dict[str, int]) -> str:
    
 🌟 **Remarkable Property**: QFT(|ψ⟩) = |ψ⟩ 
    This input state is an eigenstate of the QFT operator!
-"""
-    
-    elif input_state == "superposition_1_3":
-        return """
+""",
+    "superposition_1_3": """
 🎯 **Expected QFT Result for |ψ⟩ = (1/√2)(|01⟩ + |11⟩)**:
 
 📊 **Theoretical Prediction**:
@@ -623,10 +887,8 @@ def analyze_qft_frequencies(input_state: str, counts: Dict[str, int]) -> str:
 🔍 **Frequency Interpretation**:
   • Shows odd-parity frequency components only
   • Complementary to the even-parity case
-"""
-    
-    elif input_state == "equal_superposition":
-        return """
+""",
+    "equal_superposition": """
 🎯 **Expected QFT Result for Equal Superposition**:
 
 📊 **Theoretical Prediction**:
@@ -636,15 +898,21 @@ def analyze_qft_frequencies(input_state: str, counts: Dict[str, int]) -> str:
 🔍 **Frequency Interpretation**:
   • Pure DC component only
   • All frequency information washed out by averaging
-"""
-    
-    else:
-        return "Custom state frequency analysis not available."
+""",
+}
+
+def get_input_state_description(input_state: str) -> str:
+    """Get human-readable description of input state"""
+    return _STATE_DESCS.get(input_state, "Custom superposition state")
+
+def analyze_qft_frequencies(input_state: str, counts: Dict[str, int]) -> str:
+    """Analyze the frequency components revealed by QFT"""
+    return _FREQ_ANALYSES.get(input_state, "Custom state frequency analysis not available.")
 
 def format_general_results(request: QuantumComputationRequest, circuit: QuantumCircuit, results: Dict) -> str:
     """Format results for non-QFT operations"""
     
-    response = f"""
+    parts = [f"""
 🚀 Quantum Computation Results
 ================================
 
@@ -653,63 +921,82 @@ def format_general_results(request: QuantumComputationRequest, circuit: QuantumC
 🔬 Operation: {request.operation_type.value}
 🔢 Qubits Used: {request.num_qubits}
 💻 Backend: {results['backend']} ({results['backend_type']})
-💻 Backend: {results['backend']} ({results['backend_type']})
 🎯 Shots: {results['shots']}
 
 📊 Measurement Results:
-"""
+"""]
     
     # Add measurement counts
     counts = results['counts']
     total_shots = sum(counts.values())
     
-    for state, count in sorted(counts.items(), key=lambda x: x[1], reverse=True):
+    for state, count in Counter(counts).most_common():
         probability = count / total_shots
         percentage = probability * 100
-        response += f"  |{state}⟩: {count} ({percentage:.1f}%)\n"
+        parts.append(f"  |{state}⟩: {count} ({percentage:.1f}%)\n")
     
-    response += f"""
+    parts.append(f"""
 🔧 Circuit Properties:
   • Depth: {results['circuit_depth']}
   • Width: {results['circuit_width']}
 
 📈 Analysis:
-"""
+""")
     
     # Add operation-specific analysis
     if request.operation_type == QuantumOperationType.BELL_STATE:
-        response += "  • Bell state created successfully\n"
-        response += "  • Shows quantum entanglement between qubits\n"
-        response += "  • Expect roughly equal probabilities for |00⟩ and |11⟩\n"
+        parts.extend((
+            "  • Bell state created successfully\n",
+            "  • Shows quantum entanglement between qubits\n",
+            "  • Expect roughly equal probabilities for |00⟩ and |11⟩\n",
+        ))
     
     elif request.operation_type == QuantumOperationType.QUANTUM_RANDOM:
         if total_shots > 0:
-            entropy = -sum((count/total_shots) * np.log2(count/total_shots) for count in counts.values() if count > 0)
-            response += f"  • Quantum randomness generated\n"
-            response += f"  • Entropy: {entropy:.3f} bits\n"
-            response += f"  • Maximum possible entropy: {request.num_qubits} bits\n"
+            probs = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) / total_shots
+            probs = probs[probs > 0]
+            entropy = float(-(probs * np.log2(probs)).sum())
+            parts.extend((
+                f"  • Quantum randomness generated\n",
+                f"  • Entropy: {entropy:.3f} bits\n",
+                f"  • Maximum possible entropy: {request.num_qubits} bits\n",
+            ))
     
     elif request.operation_type == QuantumOperationType.GROVER_SEARCH:
-        response += "  • Grover's algorithm executed\n"
-        response += "  • Amplifies probability of marked states\n"
-        response += "  • Look for states with higher probabilities\n"
+        parts.extend((
+            "  • Grover's algorithm executed\n",
+            "  • Amplifies probability of marked states\n",
+            "  • Look for states with higher probabilities\n",
+        ))
+    
+    elif request.operation_type == QuantumOperationType.DEUTSCH_JOZSA:
+        parts.extend((
+            "  • Deutsch-Jozsa algorithm executed with a balanced oracle\n",
+            "  • A constant oracle would always measure all zeros\n",
+            "  • Any other outcome shows the oracle is balanced\n",
+        ))
     
     # Add special note for IBM hardware
     if "🌟 IBM Quantum Hardware" in results['backend_type']:
-        response += "\n⭐ **SPECIAL**: These results came from real quantum hardware!\n"
-        response += "   • Each measurement is a genuine quantum event\n"
-        response += "   • Results may show quantum noise and decoherence\n"
+        parts.extend((
+            "\n⭐ **SPECIAL**: These results came from real quantum hardware!\n",
+            "   • Each measurement is a genuine quantum event\n",
+            "   • Results may show quantum noise and decoherence\n",
+        ))
     
     try:
         circuit_str = circuit.draw(output='text')
-        response += f"""
+    except Exception as e:
+        logger.warning("Circuit visualization failed: %s", e)
+        circuit_str = "(circuit visualization unavailable)"
+    parts.append(f"""
 🎨 Circuit Visualization:
-{circuit.draw(output='text')}
+{circuit_str}
 
 ✅ Quantum computation completed successfully!
-"""
+""")
     
-    return response
+    return "".join(parts)
 
 async def main():
     """Run the MCP server"""
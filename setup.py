@@ -29,6 +29,9 @@ setup(
     ],
     python_requires=">=3.8",
     install_requires=requirements,
+    extras_require={
+        "test": ["pytest>=7.0", "pytest-asyncio>=0.21", "pytest-benchmark>=4.0", "pytest-xdist>=3.0"],
+    },
     entry_points={
         "console_scripts": [
             "quantum-mcp-server=quantum_mcp_server:main",
@@ -3,7 +3,18 @@
 Test script to check if environment variables are being read correctly
 """
 
+import functools
 import os
+import re
+import sys
+from pathlib import Path
+
+# Print each parsed .env entry (python test_key.py --verbose)
+VERBOSE = '--verbose' in sys.argv
+
+# KEY=value lines; comment and blank lines never match, and the key
+# cannot run past the end of its line
+_ENV_RE = re.compile(r"^[ \t]*([^#=\s][^=\n]*)=(.*)$", re.M)
 
 # Try to load .env file
 try:
@@ -15,21 +26,18 @@ except ImportError:
 except Exception as e:
     print(f"⚠️  Could not load .env file: {e}")
 
-# Manual .env file reading
+# Manual .env file reading, cached until create_sample_env() rewrites the file
+@functools.lru_cache(maxsize=1)
 def read_env_manually():
     """Read .env file manually"""
-    env_vars = {}
+    env_path = Path('.env')
     try:
-        if os.path.exists('.env'):
-            with open('.env', 'r') as f:
-                print("📄 Reading .env file manually...")
-                for line_num, line in enumerate(f, 1):
-                    line = line.strip()
-                    if line and not line.startswith('#'):
-                        if '=' in line:
-                            key, value = line.split('=', 1)
-                            env_vars[key.strip()] = value.strip()
-                            print(f"   Line {line_num}: {key.strip()}={value.strip()[:8]}...")
+        if env_path.exists():
+            print("📄 Reading .env file manually...")
+            env_vars = {key.strip(): value.strip()
+                        for key, value in _ENV_RE.findall(env_path.read_text())}
+            if VERBOSE:
+                print_env_vars(env_vars)
             return env_vars
         else:
             print("❌ No .env file found in current directory")
@@ -38,6 +46,11 @@ def read_env_manually():
         print(f"❌ Error reading .env file: {e}")
         return {}
 
+def print_env_vars(env_vars):
+    """Show each parsed entry with its value truncated"""
+    for key, value in env_vars.items():
+        print(f"   {key}={value[:8]}...")
+
 def check_api_keys():
     """Check API keys from all sources"""
     print("🔍 Checking API Keys")
@@ -58,22 +71,27 @@ def check_api_keys():
     else:
         print("  ❌ IBM_QUANTUM_TOKEN: Not found")
     
-    # Check .env file manually
-    print("\n.env File Contents:")
-    env_vars = read_env_manually()
-    
-    openai_file = env_vars.get('OPENAI_API_KEY')
-    ibm_file = env_vars.get('IBM_QUANTUM_TOKEN')
-    
-    if openai_file:
-        print(f"  ✅ OPENAI_API_KEY: {openai_file[:8]}...")
-    else:
-        print("  ❌ OPENAI_API_KEY: Not found in .env")
-    
-    if ibm_file:
-        print(f"  ✅ IBM_QUANTUM_TOKEN: {ibm_file[:8]}...")
+    # Both keys already set (e.g. by load_dotenv): the .env file cannot
+    # add anything, so skip reading it
+    if openai_env and ibm_env:
+        openai_file = ibm_file = None
     else:
-        print("  ❌ IBM_QUANTUM_TOKEN: Not found in .env")
+        # Check .env file manually
+        print("\n.env File Contents:")
+        env_vars = read_env_manually()
+        
+        openai_file = env_vars.get('OPENAI_API_KEY')
+        ibm_file = env_vars.get('IBM_QUANTUM_TOKEN')
+        
+        if openai_file:
+            print(f"  ✅ OPENAI_API_KEY: {openai_file[:8]}...")
+        else:
+            print("  ❌ OPENAI_API_KEY: Not found in .env")
+        
+        if ibm_file:
+            print(f"  ✅ IBM_QUANTUM_TOKEN: {ibm_file[:8]}...")
+        else:
+            print("  ❌ IBM_QUANTUM_TOKEN: Not found in .env")
     
     # Final status
     print(f"\n📊 Summary:")
@@ -110,6 +128,7 @@ DEFAULT_SHOTS=1024
         
         with open('.env', 'w') as f:
             f.write(sample_content)
+        read_env_manually.cache_clear()
         
         print("  ✅ Created sample .env file")
         print("  📝 Edit .env file and add your actual API keys")
@@ -117,15 +136,28 @@ DEFAULT_SHOTS=1024
     except Exception as e:
         print(f"  ❌ Error creating .env file: {e}")
 
+def test_read_env_skips_stray_and_commented_lines(tmp_path, monkeypatch):
+    """Lines without '=' and commented assignments are not parsed as keys"""
+    (tmp_path / '.env').write_text(
+        "FOO\nOPENAI_API_KEY=sk-1\nstray line\n# c=1\nIBM_QUANTUM_TOKEN=abc\n"
+    )
+    monkeypatch.chdir(tmp_path)
+    read_env_manually.cache_clear()
+    try:
+        assert read_env_manually() == {'OPENAI_API_KEY': 'sk-1', 'IBM_QUANTUM_TOKEN': 'abc'}
+    finally:
+        read_env_manually.cache_clear()
+
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) > 1 and sys.argv[1] == 'create':
         create_sample_env()
     else:
         check_api_keys()
         
+        # Set QMCP_CREATE_ENV=1 to write a sample .env when none exists
         if not os.path.exists('.env'):
-            response = input("\n🤔 Create sample .env file? (y/n): ").strip().lower()
-            if response in ['y', 'yes']:
-                create_sample_env()
\ No newline at end of file
+            if os.environ.get("QMCP_CREATE_ENV") == "1":
+                create_sample_env()
+            else:
+                print("\n💡 No .env file: run 'python test_key.py create' "
+                      "or set QMCP_CREATE_ENV=1 to write a sample one")
\ No newline at end of file